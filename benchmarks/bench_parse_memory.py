@@ -0,0 +1,88 @@
+"""Peak memory of the JSON result parser versus the streaming CSV parser.
+
+Usage: python benchmarks/bench_parse_memory.py [rows ...]
+"""
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pandas as pd
+from app_utils import parse_results, parse_csv_stream, scholarly_article_author_list_vars
+
+var_list = scholarly_article_author_list_vars
+
+
+def synthetic_rows(n):
+    for i in range(n):
+        yield {
+            'dblp_id': f"https://dblp.org/rec/conf/bench/Paper{i // 5}",
+            'title': f"A reasonably long synthetic paper title number {i // 5}.",
+            'ordinal': str(i % 5 + 1),
+            'name': f"Author Name {i % 9973}",
+            'author_dblp_id': f"https://dblp.org/pid/{i % 97}/{i % 9973}",
+        }
+
+def write_fixtures(n, directory):
+    json_path = os.path.join(directory, 'results.json')
+    csv_path = os.path.join(directory, 'results.csv')
+    bindings = [{var: {'type': 'literal', 'value': value} for var, value in row.items()} for row in synthetic_rows(n)]
+    with open(json_path, 'w') as f:
+        json.dump({'head': {'vars': var_list}, 'results': {'bindings': bindings}}, f)
+    del bindings
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(var_list)
+        for row in synthetic_rows(n):
+            writer.writerow([row[var] for var in var_list])
+    return json_path, csv_path
+
+def json_path_parse(json_path):
+    with open(json_path) as f:
+        results = json.load(f)
+    return parse_results(results, var_list)
+
+def csv_stream_parse(csv_path):
+    with open(csv_path, newline='') as f:
+        return pd.concat(parse_csv_stream(f, var_list), ignore_index=True)
+
+def csv_stream_to_csv(csv_path):
+    # Chunked mode: rows go straight to the output without building a frame.
+    out = io.StringIO()
+    with open(csv_path, newline='') as f:
+        for i, chunk in enumerate(parse_csv_stream(f, var_list)):
+            chunk.to_csv(out, index=False, header=i == 0)
+            out.truncate(0)
+            out.seek(0)
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main(sizes):
+    print(f"{'rows':>10} {'method':<22} {'seconds':>8} {'peak MiB':>9}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            json_path, csv_path = write_fixtures(n, directory)
+            for label, func, path in [
+                ('json + parse_results', json_path_parse, json_path),
+                ('csv stream -> frame', csv_stream_parse, csv_path),
+                ('csv stream -> csv', csv_stream_to_csv, csv_path),
+            ]:
+                elapsed, peak = measure(func, path)
+                print(f"{n:>10} {label:<22} {elapsed:>8.2f} {peak / 2**20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,189 @@
+"""End-to-end timing of the query-to-file pipeline, offline.
+
+Replays the SPARQL JSON fixtures in benchmarks/fixtures (scaled to the given
+row counts) through the pooled HTTP client, JSON decoding, parse_results,
+the process_* functions and the export encoders, and reports the time spent
+per stage as recorded by the metrics hooks.
+
+Usage: python benchmarks/bench_pipeline.py [rows ...] [--save FILE] [--compare FILE]
+       python benchmarks/bench_pipeline.py --record PID   (needs network)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import requests
+from requests.adapters import BaseAdapter
+
+from app_utils import author_bundle_queries, dblp_sparql_endpoint, get_paged_results
+from dblp_client import get_session
+from exports import encode_frame, export_formats
+from jobs import author_list_functions
+from local_store import set_local_store
+from metrics import collect_stage_stats, set_profile_dir
+from response_cache import set_response_cache
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+replay_endpoint = "http://replay.invalid/sparql"
+replay_pid = "https://dblp.org/pid/bench/1"
+# Stages faster than this are too noisy to flag as regressions.
+min_compared_seconds = 0.005
+
+
+def load_fixtures():
+    fixtures = {}
+    for list_name in author_bundle_queries:
+        with open(os.path.join(fixture_dir, f"{list_name}.json")) as f:
+            fixtures[list_name] = json.load(f)['results']['bindings']
+    return fixtures
+
+def scale_bindings(bindings, rows):
+    # Repeats the recorded rows, suffixing URIs so that repeated records stay
+    # distinct (as in a large real result set).
+    scaled = []
+    for i in range(rows):
+        binding = bindings[i % len(bindings)]
+        copy = i // len(bindings)
+        if copy:
+            binding = {var: dict(value, value=f"{value['value']}-{copy}") if value['type'] == 'uri' else value
+                       for var, value in binding.items()}
+        scaled.append(binding)
+    return scaled
+
+def identify_list(query):
+    # The list whose variables all occur in the query, preferring the one
+    # with the most variables.
+    candidates = [(len(var_list), list_name) for list_name, (_, var_list) in author_bundle_queries.items()
+                  if all(f"?{var}" in query for var in var_list)]
+    return max(candidates)[1]
+
+
+class ReplayAdapter(BaseAdapter):
+    # Answers SPARQL requests from the scaled fixtures, honouring the
+    # LIMIT/OFFSET of paged queries. Response bodies are kept, so repeated
+    # runs only measure the client side.
+
+    def __init__(self, bindings_by_list):
+        super().__init__()
+        self.bindings_by_list = bindings_by_list
+        self.bodies = {}
+
+    def send(self, request, **kwargs):
+        if request.body:
+            body = request.body if isinstance(request.body, str) else request.body.decode('utf-8')
+            query = parse_qs(body)['query'][0]
+        else:
+            query = parse_qs(urlparse(request.url).query)['query'][0]
+        list_name = identify_list(query)
+        limit = re.search(r"LIMIT (\d+)", query)
+        offset = re.search(r"OFFSET (\d+)", query)
+        start = int(offset.group(1)) if offset else 0
+        end = start + int(limit.group(1)) if limit else None
+        key = (list_name, start, end)
+        if key not in self.bodies:
+            _, var_list = author_bundle_queries[list_name]
+            bindings = self.bindings_by_list[list_name][start:end]
+            self.bodies[key] = json.dumps({'head': {'vars': var_list}, 'results': {'bindings': bindings}}).encode('utf-8')
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.bodies[key]
+        response.headers['Content-Type'] = 'application/sparql-results+json'
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def run_pipeline(adapter):
+    # Stage totals of one run: every list fetched, processed and encoded in
+    # every export format.
+    # Paged queries go through the session without urllib3 retries.
+    for session in (get_session(), get_session(retry=False)):
+        session.mount(replay_endpoint, adapter)
+    with collect_stage_stats() as stats:
+        for list_name, fetch in author_list_functions.items():
+            df = fetch(replay_pid, endpoint=replay_endpoint)
+            for export_format in export_formats:
+                encode_frame(df, export_format)
+    return stats.summary()
+
+def bench(rows, repeat):
+    fixtures = load_fixtures()
+    adapter = ReplayAdapter({list_name: scale_bindings(bindings, rows) for list_name, bindings in fixtures.items()})
+    best = None
+    for _ in range(repeat):
+        summary = run_pipeline(adapter).sort_index()
+        best = summary if best is None else best.where(best['seconds'] <= summary['seconds'], summary)
+    return best.sort_values(by='seconds', ascending=False)
+
+def record(dblp_person_id, endpoint):
+    os.makedirs(fixture_dir, exist_ok=True)
+    for list_name, (query_template, var_list) in author_bundle_queries.items():
+        results = get_paged_results(query_template.replace("__replace_author_id__", dblp_person_id), var_list, endpoint)
+        with open(os.path.join(fixture_dir, f"{list_name}.json"), 'w') as f:
+            json.dump(results, f, indent=1, ensure_ascii=False)
+            f.write("\n")
+        print(f"{list_name}: {len(results['results']['bindings'])} rows")
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for rows, stages in results.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(rows, {}).get(stage)
+            if before is not None and before >= min_compared_seconds and seconds > before * tolerance:
+                regressions.append(f"{rows} rows, {stage}: {before:.3f} s -> {seconds:.3f} s")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", nargs="*", type=int, default=[1000, 10000, 100000], help="rows per list")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size, the fastest is reported")
+    parser.add_argument("--save", help="write the stage timings to this JSON file")
+    parser.add_argument("--compare", help="fail if a stage is slower than in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor for --compare")
+    parser.add_argument("--profile", help="write a cProfile dump of every stage to this directory")
+    parser.add_argument("--record", metavar="PID", help="replace the fixtures with the live results for this dblp person")
+    parser.add_argument("--endpoint", default=dblp_sparql_endpoint, help="endpoint used by --record")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record(args.record, args.endpoint)
+        return 0
+
+    set_response_cache(None)
+    set_local_store(None)
+    if args.profile:
+        set_profile_dir(args.profile)
+
+    results = {}
+    for rows in args.rows:
+        start = time.perf_counter()
+        summary = bench(rows, max(1, args.repeat))
+        print(f"\n{rows} rows per list ({time.perf_counter() - start:.1f} s in total)")
+        print(summary.to_string(float_format=lambda seconds: f"{seconds:.4f}"))
+        results[str(rows)] = summary['seconds'].round(6).to_dict()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"slower: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Post-processing of query results: the former str.replace/apply passes
+versus the table-driven normalise_columns layer. The synthetic results are
+object columns, as parse_results returns them with the pinned pandas.
+
+The gain comes from dropping the row-wise apply passes (the title full stops
+and author_name_string). Prefix removal is a per-element loop in both
+versions, so coauthor_list, which only strips prefixes, is about as fast as
+before. The second table times normalise_columns on object columns against
+the same clean-up done on string[pyarrow] columns converted back to object.
+
+Usage: python benchmarks/bench_postprocess.py [rows]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+from app_utils import (
+    coauthor_list_prefixes,
+    coauthor_list_vars,
+    normalise_columns,
+    process_coauthors_list,
+    process_scholarly_article_author_list,
+    process_scholarly_article_list,
+    scholarly_article_author_list_prefixes,
+    scholarly_article_author_list_vars,
+    scholarly_article_list_prefixes,
+    scholarly_article_list_vars,
+    sort_based_on_completeness,
+)
+
+
+def maybe(i, every, value):
+    return value if i % every else None
+
+def synthetic_coauthors(n):
+    return pd.DataFrame([[
+        f"https://dblp.org/pid/{i % 97}/{i}",
+        f"Author {i}",
+        maybe(i, 3, f"http://www.wikidata.org/entity/Q{i}"),
+        maybe(i, 2, f"https://orcid.org/0000-0000-{i:04d}"),
+        maybe(i, 7, f"https://orkg.org/resource/R{i}"),
+        maybe(i, 5, f"https://scholar.google.com/citations?user=u{i}"),
+        maybe(i, 11, f"https://dl.acm.org/profile/{i}"),
+        maybe(i, 13, f"https://github.com/user{i}"),
+        maybe(i, 17, f"https://twitter.com/user{i}"),
+    ] for i in range(n)], columns=coauthor_list_vars, dtype=object)
+
+def synthetic_articles(n):
+    return pd.DataFrame([[
+        f"https://dblp.org/rec/conf/bench/P{i}",
+        f"Synthetic article title {i}" + ("." if i % 2 else ""),
+        maybe(i, 4, f"https://doi.org/10.1000/{i}"),
+        maybe(i, 3, f"{i}-{i + 9}"),
+        str(2000 + i % 25),
+        f"https://dblp.org/rec/conf/bench/{2000 + i % 25}",
+    ] for i in range(n)], columns=scholarly_article_list_vars, dtype=object)
+
+def synthetic_article_authors(n):
+    return pd.DataFrame([[
+        f"https://dblp.org/rec/conf/bench/P{i // 4}",
+        f"Synthetic article title {i // 4}" + ("." if i % 2 else ""),
+        str(i % 4 + 1),
+        f"Author {i % 5000}",
+        f"https://dblp.org/pid/{i % 97}/{i % 5000}",
+    ] for i in range(n)], columns=scholarly_article_author_list_vars, dtype=object)
+
+
+# The row-wise/multi-pass implementation this layer replaced, kept for comparison.
+
+def remove_clean_fullstop(value):
+    if isinstance(value, str) and value.endswith('.'):
+        return value[:-1]
+    return value
+
+def legacy_coauthors_list(df):
+    df = sort_based_on_completeness(df, ['dblp_id'])
+    df['scholar'] = df['scholar'].str.replace("https://scholar.google.com/citations?user=", "", regex=False)
+    df['orcid'] = df['orcid'].str.replace("https://orcid.org/", "", regex=False)
+    df['dblp_id'] = df['dblp_id'].str.replace("https://dblp.org/pid/", "", regex=False)
+    df['acm'] = df['acm'].str.replace("https://dl.acm.org/profile/", "", regex=False)
+    df['github'] = df['github'].str.replace("https://github.com/", "", regex=False)
+    df['twitter'] = df['twitter'].str.replace("https://twitter.com/", "", regex=False)
+    df['orkg'] = df['orkg'].str.replace("https://orkg.org/resource/", "", regex=False)
+    df['entity_to_link'] = np.where(df['wikidata'].notnull(), df['wikidata'].str.replace("http://www.wikidata.org/entity/", "", regex=False), df['name'])
+    df = df[['name', 'entity_to_link', 'wikidata', 'dblp_id', 'orcid', 'orkg', 'scholar', 'acm', 'github', 'twitter']]
+    return df
+
+def legacy_scholarly_article_list(df):
+    df['dblp_id'] = df['dblp_id'].str.replace("https://dblp.org/rec/", "", regex=False)
+    df['proceedings_id'] = df['proceedings_id'].str.replace("https://dblp.org/rec/", "", regex=False)
+    df['doi'] = df['doi'].str.replace("https://doi.org/", "", regex=False)
+    df['title'] = df['title'].apply(remove_clean_fullstop)
+    df['entity_to_link'] = df['title']
+    df = df[['title', 'entity_to_link', 'dblp_id', 'doi', 'pages', 'year', 'proceedings_id']]
+    return df
+
+def legacy_scholarly_article_author_list(df):
+    df['dblp_id'] = df['dblp_id'].str.replace("https://dblp.org/rec/", "", regex=False)
+    df['author_dblp_id'] = df['author_dblp_id'].str.replace("https://dblp.org/pid/", "", regex=False)
+    df['title'] = df['title'].apply(remove_clean_fullstop)
+    df['author_wd_id'] = np.where(df.index % 3 == 0, 'Q1', None)
+    df['author_name_string'] = df.apply(lambda row: row['name'] if pd.isna(row['author_wd_id']) else None, axis=1)
+    return df
+
+def current_scholarly_article_author_list(df):
+    df = process_scholarly_article_author_list(df)
+    df['author_wd_id'] = np.where(df.index % 3 == 0, 'Q1', None)
+    df['author_name_string'] = df['name'].where(df['author_wd_id'].isna(), None)
+    return df
+
+
+def as_objects(df):
+    # Missing values may be None or NaN depending on the string dtype.
+    return df.astype(object).where(df.notna(), None)
+
+
+def best_of(func, df, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        result = func(frame)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def arrow_normalise_columns(df, prefixes, strip_fullstop=()):
+    # The string[pyarrow] alternative: Arrow compute for the string methods,
+    # plus the conversion there and back.
+    for column in dict.fromkeys([*prefixes, *strip_fullstop]):
+        strings = df[column].astype('string[pyarrow]')
+        if column in prefixes:
+            strings = strings.str.removeprefix(prefixes[column])
+        if column in strip_fullstop:
+            strings = strings.str.removesuffix('.')
+        df[column] = strings.to_numpy(dtype=object, na_value=None)
+    return df
+
+def main(n):
+    print(f"{'list':<32} {'legacy s':>9} {'current s':>10} {'speedup':>8}")
+    for label, make, legacy, current in [
+        ('coauthor_list', synthetic_coauthors, legacy_coauthors_list, process_coauthors_list),
+        ('scholarly_article_list', synthetic_articles, legacy_scholarly_article_list, process_scholarly_article_list),
+        ('scholarly_article_author_list', synthetic_article_authors, legacy_scholarly_article_author_list, current_scholarly_article_author_list),
+    ]:
+        df = make(n)
+        legacy_time, legacy_result = best_of(legacy, df)
+        current_time, current_result = best_of(current, df)
+        pd.testing.assert_frame_equal(as_objects(legacy_result), as_objects(current_result))
+        print(f"{label:<32} {legacy_time:>9.3f} {current_time:>10.3f} {legacy_time / current_time:>7.1f}x")
+
+    print(f"\n{'normalise_columns':<32} {'object s':>9} {'arrow s':>10} {'speedup':>8}")
+    for label, make, prefixes, strip_fullstop in [
+        ('coauthor_list', synthetic_coauthors, coauthor_list_prefixes, ()),
+        ('scholarly_article_list', synthetic_articles, scholarly_article_list_prefixes, ['title']),
+        ('scholarly_article_author_list', synthetic_article_authors, scholarly_article_author_list_prefixes, ['title']),
+    ]:
+        df = make(n)
+        object_time, object_result = best_of(lambda frame: normalise_columns(frame, prefixes, strip_fullstop), df)
+        arrow_time, arrow_result = best_of(lambda frame: arrow_normalise_columns(frame, prefixes, strip_fullstop), df)
+        pd.testing.assert_frame_equal(as_objects(object_result), as_objects(arrow_result))
+        print(f"{label:<32} {object_time:>9.3f} {arrow_time:>10.3f} {object_time / arrow_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
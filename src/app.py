@@ -1,6 +1,15 @@
 import streamlit as st
-from app_utils import get_person_candidates, get_coauthors_list, get_proceedings_list, get_scholarly_article_list, get_scholarly_article_author_list
-import pandas as pd
+from author_search import normalise_query, search_authors, suggest_authors
+from exports import export_bytes, export_file_name, export_format_labels, export_formats, export_mime_type
+from jobs import cached_result, get_job_runner
+from quickstatements import is_resolved, iter_items, iter_output, resolve_articles
+from reconciliation import link_article_authors, link_article_proceedings, load_map
+from wikidata_index import get_wikidata_index, prefill_coauthors, prefill_proceedings
+
+job_poll_interval = 0.5
+# st.fragment is st.experimental_fragment before Streamlit 1.37.
+fragment = getattr(st, 'fragment', None) or st.experimental_fragment
+search_page_size = 30
 
 def split_name_and_id(selected_id):
     if selected_id == "Not Selected":
@@ -17,6 +26,8 @@ def set_current_view(c_view: str):
     st.session_state.current_view = c_view
 
 def clear_dblp_id():
+    # Only drops this session's references, the fetched lists stay in the
+    # shared result store for other sessions.
     st.session_state.current_view = "search_id"
     del st.session_state["selected_name"]
     del st.session_state["selected_dblp_id"]
@@ -28,14 +39,103 @@ def clear_dblp_id():
         del st.session_state['scholarly_article_list']
     if 'scholarly_article_author_list' in st.session_state:
         del st.session_state['scholarly_article_author_list']
+    if 'coauthor_proceedings_requested' in st.session_state:
+        del st.session_state['coauthor_proceedings_requested']
+    if 'articles_authors_requested' in st.session_state:
+        del st.session_state['articles_authors_requested']
+
+@fragment(run_every=job_poll_interval)
+def show_job_progress(dblp_id, list_names):
+    # Only this fragment reruns while the jobs are running, without holding a
+    # script thread in between; once they are all done (or one failed) the
+    # whole app reruns to show the results. Jobs are only looked up here, so
+    # polling never starts a query again.
+    runner = get_job_runner()
+    jobs = [runner.get(dblp_id, list_name) for list_name in list_names]
+    if any(job is None for job in jobs):
+        st.rerun()
+    finished = sum(job.finished for job in jobs)
+    if finished == len(jobs) or any(job.status == 'failed' for job in jobs):
+        st.rerun()
+    st.progress(finished / len(jobs))
+    for job in jobs:
+        st.text(job.describe())
+
+def fetch_lists_in_background(dblp_id, list_names, retry_failed=False):
+    # Results come from the shared result store when another session already
+    # fetched them. Otherwise the queries run on the process-wide job runner,
+    # so reruns and other sessions asking for the same person attach to the
+    # same jobs. Until they finish this renders their progress in a polling
+    # fragment and stops the run. A failed job is reported until it expires;
+    # it is only run again with retry_failed, i.e. when the button is clicked
+    # again. Session state only holds references to shared frames, which must
+    # not be modified in place.
+    missing = []
+    for list_name in list_names:
+        if list_name in st.session_state:
+            continue
+        df = cached_result(dblp_id, list_name)
+        if df is not None:
+            st.session_state[list_name] = df
+        else:
+            missing.append(list_name)
+    if not missing:
+        return True
+    runner = get_job_runner()
+    jobs = [runner.submit(dblp_id, list_name, retry_failed) for list_name in missing]
+    failed = [job for job in jobs if job.status == 'failed']
+    if failed:
+        for job in failed:
+            st.error(f"Querying DBLP for the {job.list_name} failed: {job.error}")
+        return False
+    if not all(job.finished for job in jobs):
+        show_job_progress(dblp_id, missing)
+        st.stop()
+    for job in jobs:
+        st.session_state[job.list_name] = job.result
+    return True
+
+def download_frame(df, file_stem, label):
+    # The file is only encoded once a format is picked and "Prepare" was
+    # clicked; encoded files are cached per table content and format, so
+    # later reruns only hand the cached bytes to the download button.
+    columns = st.columns([2, 1])
+    export_format = columns[0].selectbox(
+        f"File format for the {label}",
+        list(export_formats),
+        format_func=export_format_labels.get,
+        key=f"{file_stem}_export_format",
+    )
+    prepared_key = f"{file_stem}_export_prepared"
+    if columns[1].button("Prepare download", key=f"{file_stem}_export_prepare"):
+        st.session_state[prepared_key] = True
+    if st.session_state.get(prepared_key):
+        try:
+            data = export_bytes(df, export_format)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        st.download_button(
+            label=f"Download {label} as {export_format_labels[export_format]}",
+            data=data,
+            file_name=export_file_name(file_stem, export_format),
+            mime=export_mime_type(export_format),
+            key=f"{file_stem}_export_download",
+        )
 
-def on_selectbox_change():
-    selected_value = st.session_state["selected_id"]
+def on_selectbox_change(key="selected_id"):
+    selected_value = st.session_state[key]
     name, dblp_id = split_name_and_id(selected_value)
     if dblp_id:
         st.session_state["selected_name"] = name
         st.session_state["selected_dblp_id"] = dblp_id
 
+def move_search_page(step):
+    st.session_state["search_first"] = max(0, st.session_state.get("search_first", 0) + step)
+
+def candidate_options(candidates):
+    return ["Not Selected"] + [f"{name} ({url})" for name, url in candidates]
+
 def view_search_id():
     st.subheader("Search for your DBLP ID")
     st.info("You can also search for your ID in the DBLP search, https://dblp.org/search")
@@ -50,16 +150,38 @@ def view_search_id():
         selected_results_container.button("Clear selected person", on_click=clear_dblp_id, key="clear_id_0", type="primary")
 
     if search_button:
-        res_list = get_person_candidates(author_name)
-        res_list = ["Not Selected"] + [f"{res[0]} ({res[1]})" for res in res_list]
-        st.session_state["res_list"] = res_list
-        
-    if "res_list" in st.session_state:
-        selected_id = st.radio(
-        "DBLP search results:",
-        st.session_state["res_list"],
-        key="selected_id",
-        on_change=on_selectbox_change)
+        st.session_state["search_query"] = author_name
+        st.session_state["search_first"] = 0
+
+    # Authors seen in earlier searches (by anyone) are suggested without
+    # asking dblp, until a search for the typed name is run.
+    searched = normalise_query(st.session_state.get("search_query"))
+    if author_name and normalise_query(author_name) != searched:
+        suggestions = suggest_authors(author_name)
+        if suggestions:
+            st.radio(
+                "Previously found authors:",
+                candidate_options(suggestions),
+                key="suggested_id",
+                on_change=on_selectbox_change,
+                args=("suggested_id",))
+
+    if searched:
+        try:
+            page = search_authors(searched, st.session_state["search_first"], search_page_size)
+        except Exception as e:
+            st.error(f"Searching DBLP failed: {e}")
+            return
+        shown = f"{page.first + 1}-{page.first + len(page.candidates)} of {page.total}" if page.candidates else "none found"
+        st.radio(
+            f"DBLP search results ({shown}):",
+            candidate_options(page.candidates),
+            key="selected_id",
+            on_change=on_selectbox_change)
+        if page.has_previous or page.has_next(search_page_size):
+            columns = st.columns(2)
+            columns[0].button("Previous results", on_click=move_search_page, args=(-search_page_size,), disabled=not page.has_previous)
+            columns[1].button("Next results", on_click=move_search_page, args=(search_page_size,), disabled=not page.has_next(search_page_size))
 
 
 def generate_coauthors_and_proceedings():
@@ -76,46 +198,32 @@ def generate_coauthors_and_proceedings():
 
     st.subheader("Generate coauthor and proceedings files for Wikidata linking")
     generate_coauthors_button = st.button('Query DBLP and Generate Files')
-    if generate_coauthors_button or 'coauthor_list' in st.session_state:
-        #print("Querying for coauthors in DBLP")
-        progress_bar = st.progress(33)
-        status_text = st.empty()
-        status_text.text(f"Progress: 33%")
-        if 'coauthor_list' in st.session_state:
-            coauthor_list = st.session_state['coauthor_list']
-        else:
-            coauthor_list = get_coauthors_list(dblp_id)
-            st.session_state['coauthor_list'] = coauthor_list
+    if generate_coauthors_button:
+        st.session_state['coauthor_proceedings_requested'] = dblp_id
+    if 'coauthor_proceedings_requested' in st.session_state:
+        if not fetch_lists_in_background(st.session_state['coauthor_proceedings_requested'], ['coauthor_list', 'proceedings_list'], generate_coauthors_button):
+            del st.session_state['coauthor_proceedings_requested']
+            return
+        # With a local Wikidata index, identifiers already on Wikidata are
+        # linked here and only the remaining rows need OpenRefine.
+        wikidata_index = get_wikidata_index()
+        coauthor_list = st.session_state['coauthor_list']
+        if wikidata_index is not None:
+            coauthor_list = prefill_coauthors(coauthor_list, wikidata_index)
         st.subheader(f"Disticnt coauthors list ({len(coauthor_list)})")
-        csv = coauthor_list.to_csv(index=False)
-        csv_bytes = csv.encode('utf-8')
+        if wikidata_index is not None:
+            st.info(f"{coauthor_list['wd_id'].notna().sum()} of {len(coauthor_list)} coauthors are already linked to Wikidata (wd_id).")
         st.dataframe(coauthor_list)
-        st.download_button(
-            label="Download coauthor list as a CSV",
-            data=csv_bytes,
-            file_name='coauthor_list.csv',
-            mime='text/csv'
-        )
-        progress_bar.progress(66)
-        status_text.text(f"Progress: 66%")
+        download_frame(coauthor_list, 'coauthor_list', "coauthor list")
 
-        if 'proceedings_list' in st.session_state:
-            proceedings_list = st.session_state['proceedings_list']
-        else:
-            proceedings_list = get_proceedings_list(dblp_id)
-            st.session_state['proceedings_list'] = proceedings_list
+        proceedings_list = st.session_state['proceedings_list']
+        if wikidata_index is not None:
+            proceedings_list = prefill_proceedings(proceedings_list, wikidata_index)
         st.subheader(f"Disticnt proceedings list ({len(proceedings_list)})")
-        pro_csv = proceedings_list.to_csv(index=False)
-        pro_csv_bytes = pro_csv.encode('utf-8')
+        if wikidata_index is not None:
+            st.info(f"{proceedings_list['wd_id'].notna().sum()} of {len(proceedings_list)} proceedings are already linked to Wikidata (wd_id).")
         st.dataframe(proceedings_list)
-        st.download_button(
-            label="Download proceedings list as a CSV",
-            data=pro_csv_bytes,
-            file_name='proceedings_list.csv',
-            mime='text/csv',
-        )
-        progress_bar.progress(100)
-        status_text.text(f"Progress: 100%")
+        download_frame(proceedings_list, 'proceedings_list', "proceedings list")
 
 def generate_articles_and_authors():
 
@@ -132,77 +240,92 @@ def generate_articles_and_authors():
     
     upload_container = st.container(border=True)
     upload_container.subheader("Upload mapping files from OpenRefine")
+    # Uploads are parsed and indexed once per file content, not on every rerun.
+    coauthor_map = None
     coauthor_map_file = upload_container.file_uploader("Upload coauthor map file", type="csv")
     if coauthor_map_file is not None:
-        coauthor_map_df = pd.read_csv(coauthor_map_file)
-        coauthor_map_df = coauthor_map_df[['dblp_id', 'name', 'wd_id']]
-        coauthor_map_df = coauthor_map_df[coauthor_map_df['wd_id'].notna() & (coauthor_map_df['wd_id'] != '')]
-        upload_container.write(coauthor_map_df)
-        author_map_dict = coauthor_map_df.set_index('name')['wd_id'].to_dict()
+        try:
+            coauthor_map = load_map('coauthor', coauthor_map_file.getvalue())
+            upload_container.write(coauthor_map.df)
+        except ValueError as e:
+            upload_container.error(str(e))
 
+    proceedings_map = None
     proceedings_map_file = upload_container.file_uploader("Upload proceedings map file", type="csv")
     if proceedings_map_file is not None:
-        proceedings_map_df = pd.read_csv(proceedings_map_file)
-        proceedings_map_df = proceedings_map_df[proceedings_map_df['wd_id'].notna() & (proceedings_map_df['wd_id'] != '')]
-        proceedings_map_df = proceedings_map_df[['title', 'dblp_id', 'wd_id']]
-        upload_container.write(proceedings_map_df)
-        proceedings_map_dict = proceedings_map_df.set_index('dblp_id')['wd_id'].to_dict()
+        try:
+            proceedings_map = load_map('proceedings', proceedings_map_file.getvalue())
+            upload_container.write(proceedings_map.df)
+        except ValueError as e:
+            upload_container.error(str(e))
+
+    article_map = None
+    article_map_file = upload_container.file_uploader("Upload scholarly article map file", type="csv")
+    if article_map_file is not None:
+        try:
+            article_map = load_map('article', article_map_file.getvalue())
+            upload_container.write(article_map.df)
+        except ValueError as e:
+            upload_container.error(str(e))
 
     st.subheader("Generate scholary article list for ingesting to Wikidata")
 
     generate_articles_button = st.button('Generate files')
-    if generate_articles_button or 'scholarly_article_list' in st.session_state:
-        #print("Querying for scholarly articles in DBLP")
-        progress_bar_2 = st.progress(33)
-        status_text_2 = st.empty()
-        status_text_2.text(f"Progress: 33%")
-        if 'scholarly_article_list' in st.session_state:
-            scholarly_article_list = st.session_state['scholarly_article_list']
-        else:
-            scholarly_article_list = get_scholarly_article_list(dblp_id)
-            st.session_state['scholarly_article_list'] = scholarly_article_list
-        if proceedings_map_dict:
-            scholarly_article_list['proceedings_id'] = scholarly_article_list['proceedings_id'].map(proceedings_map_dict)
+    if generate_articles_button:
+        st.session_state['articles_authors_requested'] = dblp_id
+    if 'articles_authors_requested' in st.session_state:
+        if not fetch_lists_in_background(st.session_state['articles_authors_requested'], ['scholarly_article_list', 'scholarly_article_author_list'], generate_articles_button):
+            del st.session_state['articles_authors_requested']
+            return
+        scholarly_article_list = st.session_state['scholarly_article_list']
+        scholarly_article_list = link_article_proceedings(scholarly_article_list, proceedings_map)
+        # Articles already on Wikidata get their QID as entity_to_link.
+        scholarly_article_list = resolve_articles(scholarly_article_list, article_map)
         st.subheader(f"Scholarly articles ({len(scholarly_article_list)})")
-        scholarly_article_list_csv = scholarly_article_list.to_csv(index=False)
-        scholarly_article_list_csv_bytes = scholarly_article_list_csv.encode('utf-8')
         st.dataframe(scholarly_article_list)
+        download_frame(scholarly_article_list, 'scholarly_article_list', "scholary article list")
 
-        st.download_button(
-            label="Download scholary article list as a CSV",
-            data=scholarly_article_list_csv_bytes,
-            file_name='scholarly_article_list.csv',
-            mime='text/csv',
-        )
-
-        progress_bar_2.progress(66)
-        status_text_2.text(f"Progress: 66%")
-
-        if 'scholarly_article_author_list' in st.session_state:
-            scholarly_article_author_list = st.session_state['scholarly_article_author_list']
-        else:
-            scholarly_article_author_list = get_scholarly_article_author_list(dblp_id)
-            st.session_state['scholarly_article_author_list'] = scholarly_article_author_list
-
-        if author_map_dict:
-            scholarly_article_author_list['author_wd_id'] = scholarly_article_author_list['name'].map(author_map_dict)
-        scholarly_article_author_list['author_name_string'] = scholarly_article_author_list.apply(lambda row: row['name'] if pd.isna(row['author_wd_id']) else None, axis=1)
+        scholarly_article_author_list = st.session_state['scholarly_article_author_list']
 
+        scholarly_article_author_list = link_article_authors(scholarly_article_author_list, coauthor_map)
         scholarly_article_author_list = scholarly_article_author_list[['dblp_id', 'title', 'ordinal', 'author_wd_id', 'author_name_string']]
-        scholarly_article_author_list_csv = scholarly_article_author_list.to_csv(index=False)
-        scholarly_article_author_list_csv_bytes = scholarly_article_author_list_csv.encode('utf-8')
         st.subheader(f"Scholarly article-author pairs ({len(scholarly_article_author_list)})")
         st.dataframe(scholarly_article_author_list)
-
-        st.download_button(
-            label="Download scholary article-author pairs list as a CSV",
-            data=scholarly_article_author_list_csv_bytes,
-            file_name='scholarly_article_author_list.csv',
-            mime='text/csv',
-        )
-
-        progress_bar_2.progress(100)
-        status_text_2.text(f"Progress: 100%")
+        download_frame(scholarly_article_author_list, 'scholarly_article_author_list', "scholary article-author pairs list")
+
+        st.subheader("QuickStatements for the scholarly articles")
+        st.info("Applies the OpenRefine scholarly article schema, with reconciled authors as P50 and the others as P2093, without the OpenRefine round trip.")
+        resolved = is_resolved(scholarly_article_list)
+        st.write(f"{resolved.sum()} of {len(scholarly_article_list)} articles are already on Wikidata and will be edited. "
+                 "The others are left out unless new items are created for them explicitly.")
+        create_new = st.checkbox(f"Also create new items for the {(~resolved).sum()} articles not found on Wikidata", key='quickstatements_create_new')
+        if st.button("Generate QuickStatements", key='quickstatements_prepare'):
+            st.session_state['quickstatements_prepared'] = True
+        if st.session_state.get('quickstatements_prepared'):
+            try:
+                items = iter_items(scholarly_article_list, scholarly_article_author_list)
+                quickstatements = "".join(iter_output(items, 'quickstatements'))
+                if create_new:
+                    new_items = iter_items(scholarly_article_list, scholarly_article_author_list, new_items=True)
+                    new_quickstatements = "".join(iter_output(new_items, 'quickstatements'))
+            except ValueError as e:
+                st.error(str(e))
+                return
+            st.download_button(
+                label="Download QuickStatements",
+                data=quickstatements.encode('utf-8'),
+                file_name='scholarly_articles.qs',
+                mime='text/plain',
+                key='quickstatements_download',
+            )
+            if create_new:
+                st.download_button(
+                    label="Download QuickStatements for new items",
+                    data=new_quickstatements.encode('utf-8'),
+                    file_name='scholarly_articles_new.qs',
+                    mime='text/plain',
+                    key='quickstatements_download_new',
+                )
 
 
 # Initialize session state if not already done
@@ -1,7 +1,17 @@
-import requests
+import codecs
+import csv
+import hashlib
+import os
+import random
+import re
+import time
 import pandas as pd
 import numpy as np
-from SPARQLWrapper import SPARQLWrapper, JSON
+from concurrent.futures import ThreadPoolExecutor
+from dblp_client import declared_charset, is_retryable_error, sparql_json, sparql_request
+from local_store import get_local_store
+from metrics import timed
+from response_cache import ResponseCache, get_response_cache
 
 
 coauthor_list_query = """
@@ -30,12 +40,14 @@ ORDER BY ?dblp_id
 """
 coauthor_list_vars = ['dblp_id', 'name', 'wikidata', 'orcid', 'orkg', 'scholar', 'acm', 'github', 'twitter']
 
+# The editors of each proceedings are aggregated in the same query as
+# "ordinal<TAB>name" entries separated by newlines, see parse_editors.
 proceedings_list_query = """
 PREFIX dblp: <https://dblp.org/rdf/schema#> 
 PREFIX owl: <http://www.w3.org/2002/07/owl#>
 PREFIX datacite: <http://purl.org/spar/datacite/>
 
-SELECT DISTINCT ?dblp_id ?title ?doi ?isbn ?year ?series ?seriesVolume ?publisher {
+SELECT DISTINCT ?dblp_id ?title ?doi ?isbn ?year ?series ?seriesVolume ?publisher (GROUP_CONCAT(DISTINCT ?editor_entry; SEPARATOR="\\n") AS ?editors) {
     ?paper a dblp:Publication, dblp:Inproceedings;
         dblp:hasSignature ?sign;
         dblp:publishedAsPartOf  ?dblp_id .
@@ -48,30 +60,18 @@ SELECT DISTINCT ?dblp_id ?title ?doi ?isbn ?year ?series ?seriesVolume ?publishe
     OPTIONAL { ?dblp_id dblp:publishedBy ?publisher }
     OPTIONAL { ?dblp_id dblp:publishedInSeries ?series }
     OPTIONAL { ?dblp_id dblp:publishedInSeriesVolume ?seriesVolume }
+    OPTIONAL {
+        ?dblp_id dblp:hasSignature ?proc_sign .
+        ?proc_sign dblp:signatureCreator ?editor;
+            dblp:signatureOrdinal ?ord .
+        ?editor dblp:primaryCreatorName ?editor_name .
+        BIND (CONCAT(STR(?ord), "\\t", ?editor_name) AS ?editor_entry)
+    }
 }
+GROUP BY ?dblp_id ?title ?doi ?isbn ?year ?series ?seriesVolume ?publisher
 ORDER BY ?dblp_id
 """
-proceedings_list_vars = ['dblp_id', 'title', 'doi', 'isbn', 'year', 'series', 'seriesVolume', 'publisher']
-
-proceedings_editor_list_query = """
-PREFIX dblp: <https://dblp.org/rdf/schema#> 
-PREFIX owl: <http://www.w3.org/2002/07/owl#>
-PREFIX datacite: <http://purl.org/spar/datacite/>
-
-SELECT DISTINCT ?proceedings ?ord ?name {
-    ?paper a dblp:Publication, dblp:Inproceedings;
-        dblp:hasSignature ?sign;
-        dblp:publishedAsPartOf  ?proceedings .
-	?sign dblp:signatureCreator <__replace_author_id__> .
-
-    ?proceedings dblp:title ?title .
-    ?proceedings dblp:hasSignature ?proc_sign .
-    ?proc_sign dblp:signatureCreator ?editor;
-        dblp:signatureOrdinal ?ord .
-    ?editor dblp:primaryCreatorName ?name .
-}
-"""
-proceedings_editor_list_vars = ['proceedings', 'ord', 'name']
+proceedings_list_vars = ['dblp_id', 'title', 'doi', 'isbn', 'year', 'series', 'seriesVolume', 'publisher', 'editors']
 
 scholarly_article_list_query = """
 PREFIX dblp: <https://dblp.org/rdf/schema#> 
@@ -97,37 +97,217 @@ PREFIX dblp: <https://dblp.org/rdf/schema#>
 PREFIX owl: <http://www.w3.org/2002/07/owl#>
 PREFIX datacite: <http://purl.org/spar/datacite/>
 
-SELECT DISTINCT ?dblp_id ?title ?ordinal ?name  {
+SELECT DISTINCT ?dblp_id ?title ?ordinal ?name ?author_dblp_id {
     ?dblp_id a dblp:Publication, dblp:Inproceedings;
         dblp:title ?title;
         dblp:hasSignature ?sign;
         dblp:hasSignature ?sign_coauthor .
 	
 	?sign dblp:signatureCreator <__replace_author_id__> .
-    ?sign_coauthor dblp:signatureCreator ?dblp_person;
+    ?sign_coauthor dblp:signatureCreator ?author_dblp_id;
         dblp:signatureOrdinal ?ordinal .
     
-    ?dblp_person dblp:primaryCreatorName ?name .
+    ?author_dblp_id dblp:primaryCreatorName ?name .
 }
 """
-scholarly_article_author_list_vars = ['dblp_id', 'title', 'ordinal', 'name']
+scholarly_article_author_list_vars = ['dblp_id', 'title', 'ordinal', 'name', 'author_dblp_id']
 
 author_search_api = "https://dblp.org/search/author/api"
 dblp_sparql_endpoint = "https://sparql.dblp.org/sparql"
 
-def remove_clean_fullstop(value):
-    if isinstance(value, str) and value.endswith('.'):
-        return value[:-1]
-    return value
+sparql_csv_mime_type = "text/csv"
+default_stream_chunk_size = 10000
+# Column types of streamed results: years and author positions as nullable
+# integers, every other column as string[pyarrow].
+stream_column_types = {
+    'year': 'Int64',
+    'ordinal': 'Int64',
+}
+stream_string_type = 'string[pyarrow]'
+
+sparql_cache_ttl = 7 * 24 * 60 * 60
+author_search_cache_ttl = 24 * 60 * 60
+
+# Paging of large result sets. The page size adapts towards target_page_seconds
+# per request, within [min_page_size, max_page_size].
+default_page_size = 10000
+min_page_size = 500
+max_page_size = 100000
+target_page_seconds = 10
+page_retries = 4
+page_backoff_seconds = 2
+default_parallel_pages = 1
+# Pages requested at once, from DBLP_PARALLEL_PAGES or set_parallel_pages.
+_parallel_pages = max(1, int(os.environ.get('DBLP_PARALLEL_PAGES') or default_parallel_pages))
+
+dblp_rec_prefix = "https://dblp.org/rec/"
+dblp_pid_prefix = "https://dblp.org/pid/"
+doi_prefix = "https://doi.org/"
+wikidata_entity_prefix = "http://www.wikidata.org/entity/"
+
+# column -> URL prefix stripped by normalise_columns, per result list
+coauthor_list_prefixes = {
+    'scholar': "https://scholar.google.com/citations?user=",
+    'orcid': "https://orcid.org/",
+    'dblp_id': dblp_pid_prefix,
+    'acm': "https://dl.acm.org/profile/",
+    'github': "https://github.com/",
+    'twitter': "https://twitter.com/",
+    'orkg': "https://orkg.org/resource/",
+}
+proceedings_list_prefixes = {
+    'doi': doi_prefix,
+    'dblp_id': dblp_rec_prefix,
+}
+scholarly_article_list_prefixes = {
+    'dblp_id': dblp_rec_prefix,
+    'proceedings_id': dblp_rec_prefix,
+    'doi': doi_prefix,
+}
+scholarly_article_author_list_prefixes = {
+    'dblp_id': dblp_rec_prefix,
+    'author_dblp_id': dblp_pid_prefix,
+}
+
+def normalise_columns(df, prefixes, strip_fullstop=()):
+    # Clean-up shared by the process_* functions: removes the URL prefix of
+    # each column in prefixes and a single trailing full stop from the columns
+    # in strip_fullstop. Missing values are left untouched. On object columns
+    # the .str methods still loop in Python; converting to string[pyarrow] and
+    # back to the object columns the rest of the pipeline expects costs more
+    # than it saves (see benchmarks/bench_postprocess.py).
+    for column, prefix in prefixes.items():
+        df[column] = df[column].str.removeprefix(prefix)
+    for column in strip_fullstop:
+        df[column] = df[column].str.removesuffix('.')
+    return df
+
+def get_results(query, endpoint=dblp_sparql_endpoint, use_cache=True, retry=True):
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        cache_key = ResponseCache.make_key('sparql', endpoint, query)
+        results = cache.get(cache_key)
+        if results is not None:
+            return results
+    results = sparql_json(query, endpoint, retry=retry)
+    if cache is not None:
+        cache.set(cache_key, results, sparql_cache_ttl)
+    return results
+
+def build_page_query(query, var_list, limit, offset):
+    # Orders by every projected variable so that consecutive pages of a
+    # DISTINCT result are disjoint and complete.
+    query = re.sub(r"\s*ORDER BY[^{}]*$", "", query.rstrip())
+    order_by = " ".join(f"?{var}" for var in var_list)
+    return f"{query}\nORDER BY {order_by}\nLIMIT {limit}\nOFFSET {offset}\n"
+
+def page_retry_delay(error, attempt):
+    delay = page_backoff_seconds * 2 ** attempt * (1 + random.random())
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+    if retry_after.isdigit():
+        delay = max(delay, int(retry_after))
+    return delay
+
+def get_page_results(query, var_list, limit, offset, endpoint=dblp_sparql_endpoint, attempt=0):
+    # Fetches rows [offset, offset + limit) and returns them with the page size
+    # that succeeded. A page that times out or gets a 429/5xx is fetched again
+    # as two half pages (down to min_page_size) after a backoff; other errors
+    # are raised at once. This is the only retry layer for pages: the requests
+    # go out without urllib3 retries.
+    page_query = build_page_query(query, var_list, limit, offset)
+    try:
+        return get_results(page_query, endpoint, use_cache=False, retry=False), limit
+    except Exception as e:
+        if attempt >= page_retries or not is_retryable_error(e):
+            raise
+        delay = page_retry_delay(e, attempt)
+    time.sleep(delay)
+    half = max(min_page_size, limit // 2)
+    if half >= limit:
+        return get_page_results(query, var_list, limit, offset, endpoint, attempt + 1)
+    first, first_size = get_page_results(query, var_list, half, offset, endpoint, attempt + 1)
+    bindings = first["results"]["bindings"]
+    page_size = first_size
+    if len(bindings) == half:
+        second, second_size = get_page_results(query, var_list, limit - half, offset + half, endpoint, attempt + 1)
+        bindings = bindings + second["results"]["bindings"]
+        page_size = min(page_size, second_size)
+    return {"head": {"vars": list(var_list)}, "results": {"bindings": bindings}}, page_size
+
+def adapt_page_size(page_size, elapsed):
+    if elapsed <= 0:
+        return min(page_size * 2, max_page_size)
+    factor = min(2.0, max(0.5, target_page_seconds / elapsed))
+    return int(min(max_page_size, max(min_page_size, page_size * factor)))
+
+def set_parallel_pages(parallel_pages):
+    global _parallel_pages
+    _parallel_pages = max(1, int(parallel_pages))
 
-def get_results(query):
-    sparql = SPARQLWrapper(dblp_sparql_endpoint)
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = sparql.query().convert()
+def get_paged_results(query, var_list, endpoint=dblp_sparql_endpoint, page_size=default_page_size,
+                      parallel_pages=None, on_page=None):
+    # Fetches the result set in LIMIT/OFFSET pages, parallel_pages (by default
+    # the configured number) at a time, and returns it as a single SPARQL JSON
+    # document. The combined document is cached under the unpaged query so
+    # page sizes can vary between runs. on_page(pages_done, rows_received) is
+    # called as pages arrive.
+    cache = get_response_cache()
+    if cache is not None:
+        cache_key = ResponseCache.make_key('sparql', endpoint, query)
+        results = cache.get(cache_key)
+        if results is not None:
+            if on_page is not None:
+                on_page(1, len(results["results"]["bindings"]))
+            return results
+
+    parallel_pages = _parallel_pages if parallel_pages is None else max(1, parallel_pages)
+    bindings = []
+    pages_done = 0
+    offset = 0
+    # Once a page had to be halved, the page size never grows past the size
+    # that came through, even when the failure was quick.
+    size_cap = max_page_size
+    executor = ThreadPoolExecutor(max_workers=parallel_pages) if parallel_pages > 1 else None
+    try:
+        while True:
+            start = time.perf_counter()
+            offsets = [offset + i * page_size for i in range(parallel_pages)]
+            if executor is None:
+                fetched = [get_page_results(query, var_list, page_size, offsets[0], endpoint)]
+            else:
+                futures = [executor.submit(get_page_results, query, var_list, page_size, page_offset, endpoint)
+                           for page_offset in offsets]
+                fetched = [future.result() for future in futures]
+            elapsed = time.perf_counter() - start
+            pages = [page for page, _ in fetched]
+            # A page that only came through in halves shrinks the next ones.
+            working_page_size = min(size for _, size in fetched)
+            if working_page_size < page_size:
+                size_cap = working_page_size
+            for page in pages:
+                bindings.extend(page["results"]["bindings"])
+            pages_done += len(pages)
+            if on_page is not None:
+                on_page(pages_done, len(bindings))
+            if any(len(page["results"]["bindings"]) < page_size for page in pages):
+                break
+            offset += page_size * len(pages)
+            page_size = min(size_cap, adapt_page_size(working_page_size, elapsed))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    results = {"head": {"vars": list(var_list)}, "results": {"bindings": bindings}}
+    if cache is not None:
+        cache.set(cache_key, results, sparql_cache_ttl)
     return results
 
 def parse_results(results, var_list):
+    with timed('parse', rows=len(results["results"]["bindings"])):
+        return parse_bindings(results, var_list)
+
+def parse_bindings(results, var_list):
     processed_results = list()
     for result in results["results"]["bindings"]:
         result_array = list()
@@ -140,76 +320,206 @@ def parse_results(results, var_list):
     df = pd.DataFrame(processed_results, columns=var_list, index=None)
     return df
 
-def execute_query(query, var_list):
-    res = get_results(query)
+def execute_query(query, var_list, endpoint=dblp_sparql_endpoint, on_page=None):
+    res = get_paged_results(query, var_list, endpoint, on_page=on_page)
     return parse_results(res, var_list)
 
-def get_person_candidates(name: str):
-    params = {'format': 'json', 'q': name}
-    response = requests.get(author_search_api, params=params)
+def type_stream_columns(df, column_types=None):
+    column_types = stream_column_types if column_types is None else column_types
+    for column in df.columns:
+        dtype = column_types.get(column, stream_string_type)
+        if dtype == 'Int64':
+            df[column] = pd.to_numeric(df[column]).astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
 
-    response.raise_for_status()
-    json_data = response.json()
-    
-    res_list = []
-    if 'result' in json_data and 'hits' in json_data['result'] and 'hit' in json_data['result']['hits']:
-        for res in json_data['result']['hits']['hit']:
-            res_list.append([res['info']['author'], res['info']['url']])
-    return res_list
-
-def get_proceedings_list(dblp_person_id):
-    query = proceedings_list_query.replace("__replace_author_id__", dblp_person_id)
-    df = execute_query(query, proceedings_list_vars)
+def parse_csv_stream(text_stream, var_list, chunk_size=default_stream_chunk_size, column_types=None):
+    # Incremental parser for SPARQL 1.1 CSV results. Yields DataFrames of at
+    # most chunk_size rows with the columns of var_list, typed as in
+    # stream_column_types (or column_types); unbound values (empty cells)
+    # become missing values.
+    reader = csv.reader(text_stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    positions = [header.index(var) if var in header else None for var in var_list]
+    rows = []
+    for record in reader:
+        if not record:
+            continue
+        rows.append([(record[pos] or None) if pos is not None else None for pos in positions])
+        if len(rows) >= chunk_size:
+            yield type_stream_columns(pd.DataFrame(rows, columns=var_list, dtype=object), column_types)
+            rows = []
+    if rows:
+        yield type_stream_columns(pd.DataFrame(rows, columns=var_list, dtype=object), column_types)
+
+def iter_query_chunks(query, var_list, endpoint=dblp_sparql_endpoint, chunk_size=default_stream_chunk_size, column_types=None):
+    # Library entry point for callers that consume a large result set chunk
+    # by chunk: streams it as CSV and parses it while it is being received, so
+    # the full JSON document is never held in memory. The app and batch.py do
+    # not use it. The query is sent as one request, without the LIMIT/OFFSET
+    # paging and page retries of get_paged_results, so it suits endpoints that
+    # return the whole result within their timeout. Responses are not cached
+    # on this path.
+    with sparql_request(query, endpoint, accept=sparql_csv_mime_type, stream=True) as response:
+        text_chunks = codecs.iterdecode(response.iter_content(chunk_size=64 * 1024), declared_charset(response))
+        yield from parse_csv_stream(iter_lines_keepends(text_chunks), var_list, chunk_size, column_types)
+
+def iter_lines_keepends(text_chunks):
+    # csv.reader needs the line endings to parse quoted values spanning lines.
+    pending = ''
+    for text in text_chunks:
+        lines = (pending + text).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+        yield from lines
+    if pending:
+        yield pending
+
+def execute_query_streaming(query, var_list, endpoint=dblp_sparql_endpoint, chunk_size=default_stream_chunk_size, column_types=None):
+    # The streamed result as one typed DataFrame (see iter_query_chunks).
+    with timed('stream', chunk_size=chunk_size) as record:
+        chunks = list(iter_query_chunks(query, var_list, endpoint, chunk_size, column_types))
+        record['rows'] = sum(len(chunk) for chunk in chunks)
+    if not chunks:
+        return type_stream_columns(pd.DataFrame([], columns=var_list, dtype=object), column_types)
+    return pd.concat(chunks, ignore_index=True)
+
+def fetch_list(list_name, dblp_person_id, endpoint=dblp_sparql_endpoint, on_page=None, since_year=None):
+    # Raw (unprocessed) rows of one per-author list, from the offline store
+    # when one is configured and from the SPARQL endpoint otherwise.
+    query_template, var_list = author_bundle_queries[list_name]
+    local_store = get_local_store()
+    with timed('fetch', list_name=list_name, source='sparql' if local_store is None else 'local') as record:
+        if local_store is not None:
+            df = local_store.query(list_name, dblp_person_id, var_list, since_year)
+            if on_page is not None:
+                on_page(1, len(df))
+        else:
+            query = query_template.replace("__replace_author_id__", dblp_person_id)
+            if since_year is not None:
+                query = add_year_filter(query, since_year)
+            df = execute_query(query, var_list, endpoint, on_page)
+        record['rows'] = len(df)
+    return df
+
+def get_proceedings_list(dblp_person_id, endpoint=dblp_sparql_endpoint, on_page=None):
+    df = fetch_list('proceedings_list', dblp_person_id, endpoint, on_page)
+    return process_list('proceedings_list', df)
+
+def parse_editors(value):
+    if not isinstance(value, str) or not value:
+        return None
+    entries = [entry.split("\t", 1) for entry in value.split("\n")]
+    entries.sort(key=lambda entry: int(entry[0]))
+    return [name for _, name in entries]
+
+def process_proceedings_list(df):
     df = sort_based_on_completeness(df, ['dblp_id'])
-    editors_dict  = get_proceedings_editor_list(dblp_person_id)
     df['entity_to_link'] = df['title']
-    df['editors'] = df['dblp_id'].map(editors_dict)
-    df['doi'] = df['doi'].str.replace("https://doi.org/", "", regex=False)
-    df['dblp_id'] = df['dblp_id'].str.replace("https://dblp.org/rec/", "", regex=False)
+    df['editors'] = [parse_editors(value) for value in df['editors']]
+    df = normalise_columns(df, proceedings_list_prefixes)
     df = df[['title', 'entity_to_link', 'editors', 'dblp_id', 'doi', 'isbn', 'year', 'series', 'seriesVolume', 'publisher']]
     return df
 
-def get_proceedings_editor_list(dblp_person_id):
-    query = proceedings_editor_list_query.replace("__replace_author_id__", dblp_person_id)
-    df = execute_query(query, proceedings_editor_list_vars)
-    df = df.sort_values(by=['proceedings', 'ord'])
-    df = df.groupby('proceedings')['name'].apply(list).reset_index()
-    df_dict = df.set_index('proceedings')['name'].to_dict()
-    return df_dict
-
-def get_scholarly_article_list(dblp_person_id):
-    query = scholarly_article_list_query.replace("__replace_author_id__", dblp_person_id)
-    df = execute_query(query, scholarly_article_list_vars)
-    df['dblp_id'] = df['dblp_id'].str.replace("https://dblp.org/rec/", "", regex=False)
-    df['proceedings_id'] = df['proceedings_id'].str.replace("https://dblp.org/rec/", "", regex=False)
-    df['doi'] = df['doi'].str.replace("https://doi.org/", "", regex=False)
-    df['title'] = df['title'].apply(remove_clean_fullstop)
+def add_year_filter(query, since_year):
+    # Restricts a publication query to records published in or after
+    # since_year. Records without a year are kept, so they are not lost.
+    year_filter = f"""
+    OPTIONAL {{ ?dblp_id dblp:yearOfPublication ?since_year }}
+    FILTER (!BOUND(?since_year) || STR(?since_year) >= "{int(since_year)}")
+"""
+    end = query.rindex("}")
+    return query[:end] + year_filter + query[end:]
+
+def get_scholarly_article_list(dblp_person_id, endpoint=dblp_sparql_endpoint, on_page=None, since_year=None):
+    df = fetch_list('scholarly_article_list', dblp_person_id, endpoint, on_page, since_year)
+    return process_list('scholarly_article_list', df)
+
+def process_scholarly_article_list(df):
+    df = normalise_columns(df, scholarly_article_list_prefixes, strip_fullstop=['title'])
     df['entity_to_link'] = df['title']
     df = df[['title', 'entity_to_link', 'dblp_id', 'doi', 'pages', 'year', 'proceedings_id']]
     return df
 
-def get_scholarly_article_author_list(dblp_person_id):
-    query = scholarly_article_author_list_query.replace("__replace_author_id__", dblp_person_id)
-    df = execute_query(query, scholarly_article_author_list_vars)
-    df['dblp_id'] = df['dblp_id'].str.replace("https://dblp.org/rec/", "", regex=False)
-    df['title'] = df['title'].apply(remove_clean_fullstop)
+def get_scholarly_article_author_list(dblp_person_id, endpoint=dblp_sparql_endpoint, on_page=None, since_year=None):
+    df = fetch_list('scholarly_article_author_list', dblp_person_id, endpoint, on_page, since_year)
+    return process_list('scholarly_article_author_list', df)
+
+def process_scholarly_article_author_list(df):
+    df = normalise_columns(df, scholarly_article_author_list_prefixes, strip_fullstop=['title'])
     return df
 
-def get_coauthors_list(dblp_person_id):
-    query = coauthor_list_query.replace("__replace_author_id__", dblp_person_id)
-    df = execute_query(query, coauthor_list_vars)
+def get_coauthors_list(dblp_person_id, endpoint=dblp_sparql_endpoint, on_page=None):
+    df = fetch_list('coauthor_list', dblp_person_id, endpoint, on_page)
+    return process_list('coauthor_list', df)
+
+def process_coauthors_list(df):
     df = sort_based_on_completeness(df, ['dblp_id'])
-    df['scholar'] = df['scholar'].str.replace("https://scholar.google.com/citations?user=", "", regex=False)
-    df['orcid'] = df['orcid'].str.replace("https://orcid.org/", "", regex=False)
-    df['dblp_id'] = df['dblp_id'].str.replace("https://dblp.org/pid/", "", regex=False)
-    df['acm'] = df['acm'].str.replace("https://dl.acm.org/profile/", "", regex=False)
-    df['github'] = df['github'].str.replace("https://github.com/", "", regex=False)
-    df['twitter'] = df['twitter'].str.replace("https://twitter.com/", "", regex=False)
-    df['orkg'] = df['orkg'].str.replace("https://orkg.org/resource/", "", regex=False)
-    df['entity_to_link'] = np.where(df['wikidata'].notnull(), df['wikidata'].str.replace("http://www.wikidata.org/entity/", "", regex=False), df['name'])
+    df = normalise_columns(df, coauthor_list_prefixes)
+    df['entity_to_link'] = np.where(df['wikidata'].notnull(), df['wikidata'].str.removeprefix(wikidata_entity_prefix), df['name'])
     df = df[['name', 'entity_to_link', 'wikidata', 'dblp_id', 'orcid', 'orkg', 'scholar', 'acm', 'github', 'twitter']]
     return df
 
+# query name -> (query template, variables), fetched concurrently by get_author_bundle
+author_bundle_queries = {
+    'coauthor_list': (coauthor_list_query, coauthor_list_vars),
+    'proceedings_list': (proceedings_list_query, proceedings_list_vars),
+    'scholarly_article_list': (scholarly_article_list_query, scholarly_article_list_vars),
+    'scholarly_article_author_list': (scholarly_article_author_list_query, scholarly_article_author_list_vars),
+}
+author_bundle_lists = ['coauthor_list', 'proceedings_list', 'scholarly_article_list', 'scholarly_article_author_list']
+# Bump when a process_* function changes its output, so stored results are not reused.
+result_format_version = 1
+
+def query_version(list_name):
+    query_template, var_list = author_bundle_queries[list_name]
+    digest = hashlib.sha1(query_template.encode('utf-8'))
+    digest.update(",".join(var_list).encode('utf-8'))
+    digest.update(str(result_format_version).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+def get_author_bundle(dblp_person_id, lists=None, max_concurrency=5, endpoint=dblp_sparql_endpoint):
+    # Sends the independent per-author queries in parallel, so wall time is
+    # roughly that of the slowest query instead of the sum of all of them.
+    if lists is None:
+        lists = author_bundle_lists
+    raw = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(lists)))) as executor:
+        futures = {}
+        for query_name in lists:
+            futures[query_name] = executor.submit(fetch_list, query_name, dblp_person_id, endpoint)
+        for query_name, future in futures.items():
+            raw[query_name] = future.result()
+
+    return process_author_bundle(raw, lists)
+
+list_processors = {
+    'coauthor_list': process_coauthors_list,
+    'proceedings_list': process_proceedings_list,
+    'scholarly_article_list': process_scholarly_article_list,
+    'scholarly_article_author_list': process_scholarly_article_author_list,
+}
+
+def process_list(list_name, df):
+    with timed('process', list_name=list_name, rows=len(df)):
+        return list_processors[list_name](df)
+
+def process_author_bundle(raw, lists):
+    return {list_name: process_list(list_name, raw[list_name]) for list_name in author_bundle_lists if list_name in lists}
+
+def build_batch_query(query_template, dblp_person_ids, author_var='batch_author'):
+    # Rewrites a single-author query template so that it answers for several
+    # authors at once: the author becomes a variable bound by a VALUES clause
+    # and is returned as the first result column.
+    values = " ".join(f"<{dblp_person_id}>" for dblp_person_id in dblp_person_ids)
+    query = query_template.replace("<__replace_author_id__>", f"?{author_var}")
+    query = query.replace("SELECT DISTINCT ", f"SELECT DISTINCT ?{author_var} ", 1)
+    query = query.replace("GROUP BY ", f"GROUP BY ?{author_var} ", 1)
+    query = query.replace("{", f"{{\n    VALUES ?{author_var} {{ {values} }}", 1)
+    return query
+
 def sort_based_on_completeness(df, sort_by):
     df['non_null_count'] = df.notnull().sum(axis=1)
     df = df.sort_values(by=['non_null_count']+sort_by, ascending=False)
@@ -0,0 +1,201 @@
+import bisect
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from app_utils import author_search_api, author_search_cache_ttl, dblp_pid_prefix
+from dblp_client import get_json
+from response_cache import ResponseCache, get_response_cache
+
+default_page_size = 30
+# dblp returns at most this many hits per request
+max_page_size = 1000
+max_cached_searches = 512
+max_indexed_authors = 100000
+default_suggestions = 10
+
+
+def normalise_query(text):
+    # Case, Unicode form and spacing do not change dblp's hits, so they do
+    # not make a separate cache entry either.
+    return " ".join(unicodedata.normalize('NFKC', text or '').casefold().split())
+
+
+class SearchPage:
+    def __init__(self, query, candidates, total, first):
+        self.query = query
+        # [name, dblp person URL] pairs, as shown in the search view
+        self.candidates = candidates
+        self.total = total
+        self.first = first
+
+    @property
+    def has_previous(self):
+        return self.first > 0
+
+    def has_next(self, page_size):
+        return self.first + page_size < self.total
+
+
+class AuthorPrefixIndex:
+    # Names and PIDs of every author seen in a search result. Each name is
+    # indexed from the start of each of its words, so "wang" finds "Wei Wang";
+    # PIDs are indexed as given ("w/", "12/34").
+
+    def __init__(self, max_authors=max_indexed_authors):
+        self.max_authors = max_authors
+        self._authors = OrderedDict()
+        self._keys = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index_keys(name, pid):
+        words = normalise_query(name).split()
+        keys = [" ".join(words[i:]) for i in range(len(words))]
+        keys.append(pid.removeprefix(dblp_pid_prefix).casefold())
+        return keys
+
+    def add(self, name, url):
+        with self._lock:
+            if url in self._authors:
+                self._authors.move_to_end(url)
+                return
+            self._authors[url] = name
+            for key in self._index_keys(name, url):
+                bisect.insort(self._keys, (key, url))
+            if len(self._authors) > self.max_authors:
+                self._evict()
+
+    def _evict(self):
+        # Drops the least recently seen tenth and rebuilds the key list once,
+        # instead of removing keys one by one.
+        for _ in range(max(1, self.max_authors // 10)):
+            self._authors.popitem(last=False)
+        self._keys = sorted((key, url) for url, name in self._authors.items() for key in self._index_keys(name, url))
+
+    def suggest(self, prefix, limit=default_suggestions):
+        prefix = normalise_query(prefix)
+        if not prefix:
+            return []
+        found = {}
+        with self._lock:
+            for key, url in self._keys[bisect.bisect_left(self._keys, (prefix, '')):]:
+                if not key.startswith(prefix) or len(found) >= limit:
+                    break
+                found.setdefault(url, self._authors[url])
+        return [[name, url] for url, name in found.items()]
+
+    def __len__(self):
+        return len(self._authors)
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class AuthorSearch:
+    # dblp author search with an LRU of result pages keyed by the normalised
+    # query and page, expiring after ttl seconds like the on-disk cache.
+    # Identical concurrent searches share one request, and every hit feeds the
+    # prefix index used for suggestions.
+
+    def __init__(self, max_entries=max_cached_searches, ttl=author_search_cache_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.index = AuthorPrefixIndex()
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def search(self, text, first=0, page_size=default_page_size):
+        query = normalise_query(text)
+        page_size = max(1, min(page_size, max_page_size))
+        if not query:
+            return SearchPage(query, [], 0, 0)
+        key = (query, first, page_size)
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None:
+                page, stored_at = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._pages.move_to_end(key)
+                    self.hits += 1
+                    return page
+                del self._pages[key]
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+            if owner:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                self.misses += 1
+        if not owner:
+            in_flight.event.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+        try:
+            in_flight.result = self._fetch(query, first, page_size)
+            with self._lock:
+                self._pages[key] = (in_flight.result, time.monotonic())
+                while len(self._pages) > self.max_entries:
+                    self._pages.popitem(last=False)
+            return in_flight.result
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.event.set()
+
+    def _fetch(self, query, first, page_size):
+        params = {'format': 'json', 'q': query, 'h': page_size, 'f': first}
+        cache = get_response_cache()
+        json_data = None
+        if cache is not None:
+            cache_key = ResponseCache.make_key('author_search', author_search_api, json.dumps(params, sort_keys=True))
+            json_data = cache.get(cache_key)
+        if json_data is None:
+            json_data = get_json(author_search_api, params)
+            if cache is not None:
+                cache.set(cache_key, json_data, author_search_cache_ttl)
+
+        hits = json_data.get('result', {}).get('hits', {})
+        candidates = []
+        for hit in hits.get('hit', []):
+            info = hit.get('info', {})
+            if 'author' in info and 'url' in info:
+                candidates.append([info['author'], info['url']])
+                self.index.add(info['author'], info['url'])
+        total = int(hits.get('@total', len(candidates)))
+        return SearchPage(query, candidates, total, first)
+
+    def suggest(self, prefix, limit=default_suggestions):
+        return self.index.suggest(prefix, limit)
+
+
+_author_search = None
+_author_search_lock = threading.Lock()
+
+def get_author_search():
+    global _author_search
+    with _author_search_lock:
+        if _author_search is None:
+            _author_search = AuthorSearch()
+        return _author_search
+
+def search_authors(text, first=0, page_size=default_page_size):
+    return get_author_search().search(text, first, page_size)
+
+def suggest_authors(prefix, limit=default_suggestions):
+    return get_author_search().suggest(prefix, limit)
+
+def get_person_candidates(name: str):
+    return search_authors(name).candidates
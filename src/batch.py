@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app_utils import (
+    author_bundle_lists,
+    author_bundle_queries,
+    build_batch_query,
+    dblp_pid_prefix,
+    dblp_sparql_endpoint,
+    execute_query,
+    get_author_bundle,
+    process_author_bundle,
+    set_parallel_pages,
+)
+from exports import StreamingFrameWriter, export_formats, write_frame
+from local_store import get_local_store
+from wikidata_index import prefill_bundle
+
+progress_file_name = "progress.json"
+
+
+def normalise_pid(dblp_person_id):
+    dblp_person_id = dblp_person_id.strip()
+    if dblp_person_id.startswith("http://") or dblp_person_id.startswith("https://"):
+        return dblp_person_id.replace("http://", "https://", 1)
+    return dblp_pid_prefix + dblp_person_id.strip("/")
+
+def pid_output_dir(output_dir, dblp_person_id):
+    short_pid = dblp_person_id.replace(dblp_pid_prefix, "", 1)
+    return os.path.join(output_dir, short_pid.replace("/", "_"))
+
+def chunk(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class BatchProgress:
+    # Resumable record of finished and failed PIDs, rewritten atomically
+    # after every batch so an interrupted run can pick up where it stopped.
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.failed = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.done = set(state.get('done', []))
+            self.failed = state.get('failed', {})
+
+    def mark_done(self, dblp_person_id):
+        with self._lock:
+            self.done.add(dblp_person_id)
+            self.failed.pop(dblp_person_id, None)
+            self._save()
+
+    def mark_failed(self, dblp_person_id, error):
+        with self._lock:
+            self.failed[dblp_person_id] = str(error)
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'done': sorted(self.done), 'failed': self.failed}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def fetch_batch(dblp_person_ids, lists=author_bundle_lists, endpoint=dblp_sparql_endpoint):
+    # Runs each query once for the whole batch and splits the rows per author.
+    # The offline store answers per author in milliseconds, so it needs no batching.
+    if get_local_store() is not None:
+        return {dblp_person_id: get_author_bundle(dblp_person_id, lists, max_concurrency=1, endpoint=endpoint)
+                for dblp_person_id in dblp_person_ids}
+    raw_by_query = {}
+    for query_name in lists:
+        query_template, var_list = author_bundle_queries[query_name]
+        query = build_batch_query(query_template, dblp_person_ids)
+        raw_by_query[query_name] = execute_query(query, ['batch_author'] + var_list, endpoint)
+
+    bundles = {}
+    for dblp_person_id in dblp_person_ids:
+        raw = {}
+        for query_name, df in raw_by_query.items():
+            author_rows = df[df['batch_author'] == dblp_person_id]
+            raw[query_name] = author_rows.drop(columns=['batch_author']).reset_index(drop=True)
+        bundles[dblp_person_id] = process_author_bundle(raw, lists)
+    return bundles
+
+def write_bundle(output_dir, dblp_person_id, bundle, export_format='csv'):
+    author_dir = pid_output_dir(output_dir, dblp_person_id)
+    os.makedirs(author_dir, exist_ok=True)
+    for list_name, df in bundle.items():
+        write_frame(df, os.path.join(author_dir, list_name), export_format)
+
+
+class CombinedWriters:
+    # One file per list for the whole run, with the author's PID as first
+    # column, written batch by batch. CSV files are appended to when a run is
+    # resumed; Parquet files cannot be, so a resumed run starts a new part.
+
+    def __init__(self, output_dir, export_format):
+        self.output_dir = output_dir
+        self.export_format = export_format
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    def _writer(self, list_name, columns):
+        with self._lock:
+            writer = self._writers.get(list_name)
+            if writer is None:
+                extension = export_formats[self.export_format][0]
+                path = os.path.join(self.output_dir, list_name + extension)
+                part = 1
+                while self.export_format == 'parquet' and os.path.exists(path):
+                    path = os.path.join(self.output_dir, f"{list_name}-{part}{extension}")
+                    part += 1
+                writer = StreamingFrameWriter(path, self.export_format, ['dblp_person_id'] + list(columns), append=True)
+                self._writers[list_name] = writer
+            return writer
+
+    def write_bundle(self, dblp_person_id, bundle):
+        for list_name, df in bundle.items():
+            self._writer(list_name, df.columns).write(df.assign(dblp_person_id=dblp_person_id))
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+
+def process_batch(dblp_person_ids, output_dir, progress, lists, endpoint, export_format='csv', combined=None):
+    try:
+        bundles = fetch_batch(dblp_person_ids, lists, endpoint)
+    except Exception:
+        # Fall back to one author at a time so a single bad PID only fails itself.
+        bundles = {}
+        for dblp_person_id in dblp_person_ids:
+            try:
+                bundles[dblp_person_id] = get_author_bundle(dblp_person_id, lists, max_concurrency=1, endpoint=endpoint)
+            except Exception as e:
+                progress.mark_failed(dblp_person_id, e)
+    for dblp_person_id, bundle in bundles.items():
+        # A prefill or write error only fails this author, not the run.
+        try:
+            bundle = prefill_bundle(bundle)
+            if combined is not None:
+                combined.write_bundle(dblp_person_id, bundle)
+            else:
+                write_bundle(output_dir, dblp_person_id, bundle, export_format)
+        except Exception as e:
+            progress.mark_failed(dblp_person_id, e)
+            continue
+        progress.mark_done(dblp_person_id)
+
+def run_batch(dblp_person_ids, output_dir, batch_size=20, max_workers=2, lists=author_bundle_lists,
+              endpoint=dblp_sparql_endpoint, retry_failed=True, export_format='csv', combine=False):
+    os.makedirs(output_dir, exist_ok=True)
+    progress = BatchProgress(os.path.join(output_dir, progress_file_name))
+
+    pending = []
+    for dblp_person_id in dict.fromkeys(normalise_pid(pid) for pid in dblp_person_ids):
+        if dblp_person_id in progress.done:
+            continue
+        if dblp_person_id in progress.failed and not retry_failed:
+            continue
+        pending.append(dblp_person_id)
+
+    combined = CombinedWriters(output_dir, export_format) if combine else None
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [executor.submit(process_batch, batch, output_dir, progress, lists, endpoint, export_format, combined)
+                       for batch in chunk(pending, batch_size)]
+            for future in as_completed(futures):
+                future.result()
+    finally:
+        if combined is not None:
+            combined.close()
+    return progress
+
+def read_pids(path):
+    with (sys.stdin if path == "-" else open(path)) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export dblp coauthor, proceedings, article and article-author lists for many authors.")
+    parser.add_argument("pids", nargs="*", help="dblp person IDs, either as 'xx/yyyy' or as full https://dblp.org/pid/ URLs")
+    parser.add_argument("-f", "--pid-file", help="file with one dblp person ID per line ('-' for stdin)")
+    parser.add_argument("-o", "--output-dir", default="dblp_export")
+    parser.add_argument("--batch-size", type=int, default=20, help="authors per SPARQL VALUES clause")
+    parser.add_argument("--max-workers", type=int, default=2, help="batches queried in parallel")
+    parser.add_argument("--parallel-pages", type=int, help="result pages of one query requested at once (default: DBLP_PARALLEL_PAGES or 1)")
+    parser.add_argument("--endpoint", default=dblp_sparql_endpoint)
+    parser.add_argument("--skip-failed", action="store_true", help="do not retry PIDs that failed in a previous run")
+    parser.add_argument("--format", choices=list(export_formats), default="csv", help="output file format")
+    parser.add_argument("--combine", action="store_true", help="write one file per list for all authors instead of one directory per author")
+    args = parser.parse_args(argv)
+    if args.parallel_pages is not None:
+        set_parallel_pages(args.parallel_pages)
+
+    pids = list(args.pids)
+    if args.pid_file:
+        pids += read_pids(args.pid_file)
+    if not pids:
+        parser.error("no dblp person IDs given")
+
+    progress = run_batch(pids, args.output_dir, args.batch_size, args.max_workers,
+                         endpoint=args.endpoint, retry_failed=not args.skip_failed,
+                         export_format=args.format, combine=args.combine)
+    print(f"{len(progress.done)} done, {len(progress.failed)} failed")
+    for dblp_person_id, error in progress.failed.items():
+        print(f"  {dblp_person_id}: {error}", file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
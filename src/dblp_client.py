@@ -0,0 +1,128 @@
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import timed
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode "br" responses)
+    accept_encoding = "gzip, deflate, br"
+except ImportError:
+    accept_encoding = "gzip, deflate"
+
+sparql_json_mime_type = "application/sparql-results+json"
+
+# (connect, read) timeouts in seconds
+default_timeout = (10, 300)
+default_retries = 3
+default_backoff_factor = 1
+default_pool_maxsize = 16
+# Queries longer than this are sent as a POST body instead of a GET URL.
+post_query_threshold = 2000
+
+# Responses worth another attempt; anything else (e.g. a 400 for a malformed
+# query) fails the same way again.
+retry_status_codes = [429, 500, 502, 503, 504]
+
+_session = None
+# Same pool settings but without urllib3 retries, for callers that retry
+# themselves (the paged SPARQL queries), so only one retry layer applies.
+_plain_session = None
+_session_config = {
+    'timeout': default_timeout,
+    'retries': default_retries,
+    'backoff_factor': default_backoff_factor,
+    'pool_maxsize': default_pool_maxsize,
+}
+_session_lock = threading.Lock()
+
+
+def build_session(retries, backoff_factor, pool_maxsize):
+    if not retries:
+        retry = Retry(total=0)
+    else:
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_status_codes,
+            allowed_methods=None,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({'Accept-Encoding': accept_encoding})
+    return session
+
+def get_session(retry=True):
+    global _session, _plain_session
+    with _session_lock:
+        if not retry:
+            if _plain_session is None:
+                _plain_session = build_session(0, 0, _session_config['pool_maxsize'])
+            return _plain_session
+        if _session is None:
+            _session = build_session(_session_config['retries'], _session_config['backoff_factor'], _session_config['pool_maxsize'])
+        return _session
+
+def is_retryable_error(error):
+    # Timeouts, dropped connections and 429/5xx responses.
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in retry_status_codes
+    return isinstance(error, (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError))
+
+def declared_charset(response, default='utf-8'):
+    # The charset the server sent in Content-Type, else default. requests
+    # falls back to ISO-8859-1 for any text/* type without one, which garbles
+    # SPARQL CSV/TSV results (UTF-8 by spec).
+    match = re.search(r'charset="?([^";\s]+)', response.headers.get('Content-Type', ''), re.IGNORECASE)
+    return match.group(1) if match else default
+
+def configure_client(timeout=None, retries=None, backoff_factor=None, pool_maxsize=None):
+    # Changes take effect for the next request; the pooled session is rebuilt.
+    global _session, _plain_session
+    with _session_lock:
+        for key, value in [('timeout', timeout), ('retries', retries), ('backoff_factor', backoff_factor), ('pool_maxsize', pool_maxsize)]:
+            if value is not None:
+                _session_config[key] = value
+        for session in (_session, _plain_session):
+            if session is not None:
+                session.close()
+        _session = None
+        _plain_session = None
+
+def sparql_request(query, endpoint, accept=sparql_json_mime_type, stream=False, retry=True):
+    # For streamed responses the timing ends when the headers arrive. With
+    # retry=False a failure is raised at once, for callers with their own retries.
+    session = get_session(retry)
+    headers = {'Accept': accept}
+    timeout = _session_config['timeout']
+    with timed('http_request', endpoint=endpoint, accept=accept, stream=stream) as record:
+        if len(query) > post_query_threshold:
+            response = session.post(endpoint, data={'query': query}, headers=headers, timeout=timeout, stream=stream)
+        else:
+            response = session.get(endpoint, params={'query': query}, headers=headers, timeout=timeout, stream=stream)
+        record['status'] = response.status_code
+        if not stream:
+            record['bytes'] = len(response.content)
+    response.raise_for_status()
+    return response
+
+def sparql_json(query, endpoint, retry=True):
+    response = sparql_request(query, endpoint, retry=retry)
+    with timed('json_decode', bytes=len(response.content)) as record:
+        results = response.json()
+        record['rows'] = len(results.get('results', {}).get('bindings', []))
+    return results
+
+def get_json(url, params):
+    with timed('http_request', endpoint=url) as record:
+        response = get_session().get(url, params=params, timeout=_session_config['timeout'])
+        record['status'] = response.status_code
+    response.raise_for_status()
+    return response.json()
@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import io
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+from metrics import timed
+
+# Download formats offered next to plain CSV: extension and MIME type.
+export_formats = {
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+export_format_labels = {
+    'csv': 'CSV',
+    'csv.gz': 'gzipped CSV',
+    'parquet': 'Parquet',
+}
+# Columns holding lists of strings (the ordered proceedings editors); every
+# other column is written as a string column.
+list_columns = {'editors'}
+
+# Encoded exports are kept per (frame version, format) so a rerun or another
+# session downloading the same table does not encode it again.
+export_cache_max_bytes = 256 * 1024 * 1024
+csv_chunk_rows = 50000
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ValueError("Parquet export needs the pyarrow package (pip install pyarrow)") from e
+    return pyarrow
+
+def arrow_schema(columns):
+    pa = require_pyarrow()
+    return pa.schema([(column, pa.list_(pa.string()) if column in list_columns else pa.string())
+                      for column in columns])
+
+def arrow_table(df, schema):
+    pa = require_pyarrow()
+    df = df.astype(object).where(df.notna(), None)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+def frame_version(df):
+    # Content hash of a frame. The lists in the app are shared and never
+    # modified in place, so the hash is remembered for as long as the frame
+    # object is alive.
+    with _versions_lock:
+        entry = _versions.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+    # The row hashes are hashed in order, so a reordered frame gets its own version.
+    row_hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+    digest = hashlib.sha1(row_hashes.to_numpy().tobytes()).hexdigest()
+    version = f"{'|'.join(map(str, df.columns))}:{len(df)}:{digest}"
+    with _versions_lock:
+        _versions[id(df)] = (weakref.ref(df), version)
+        weakref.finalize(df, _versions.pop, id(df), None)
+    return version
+
+def encode_frame(df, export_format):
+    with timed('encode', format=export_format, rows=len(df)) as record:
+        data = encode_frame_bytes(df, export_format)
+        record['bytes'] = len(data)
+    return data
+
+def encode_frame_bytes(df, export_format):
+    if export_format == 'csv':
+        return df.to_csv(index=False).encode('utf-8')
+    if export_format == 'csv.gz':
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as f:
+            write_csv_chunks(df, f, header=True)
+        return buffer.getvalue()
+    if export_format == 'parquet':
+        pq = require_pyarrow().parquet
+        buffer = io.BytesIO()
+        pq.write_table(arrow_table(df, arrow_schema(df.columns)), buffer, compression='zstd')
+        return buffer.getvalue()
+    raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(export_formats)}")
+
+def write_csv_chunks(df, f, header):
+    # Encodes a bounded number of rows at a time instead of the whole table.
+    for start in range(0, max(len(df), 1), csv_chunk_rows):
+        text = df.iloc[start:start + csv_chunk_rows].to_csv(index=False, header=header and start == 0)
+        f.write(text.encode('utf-8'))
+
+
+class ExportCache:
+    # LRU of encoded exports bounded by their total size.
+
+    def __init__(self, max_bytes=export_cache_max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_or_encode(self, df, export_format):
+        key = (frame_version(df), export_format)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        data = encode_frame(df, export_format)
+        with self._lock:
+            if key not in self._entries and len(data) <= self.max_bytes:
+                self._entries[key] = data
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return data
+
+
+_export_cache = ExportCache()
+
+def export_bytes(df, export_format='csv'):
+    return _export_cache.get_or_encode(df, export_format)
+
+def export_file_name(stem, export_format):
+    return stem + export_formats[export_format][0]
+
+def export_mime_type(export_format):
+    return export_formats[export_format][1]
+
+
+def write_frame(df, path_stem, export_format='csv'):
+    # Writes one table straight to disk, without building it in memory first.
+    # An existing file is replaced, so re-running an export does not repeat rows.
+    path = path_stem + export_formats[export_format][0]
+    with StreamingFrameWriter(path, export_format, df.columns) as writer:
+        writer.write(df)
+    return path
+
+
+class StreamingFrameWriter:
+    # Writes frames with the same columns to one file, chunk by chunk. With
+    # append, an existing CSV or gzipped CSV file is continued (keeping its
+    # header); otherwise it is replaced. Parquet files are always new and get
+    # one row group per write.
+
+    def __init__(self, path, export_format, columns, append=False):
+        if export_format not in export_formats:
+            raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(export_formats)}")
+        self.path = path
+        self.export_format = export_format
+        self.columns = list(columns)
+        self.rows_written = 0
+        self._lock = threading.Lock()
+        if export_format == 'parquet':
+            self._schema = arrow_schema(self.columns)
+            self._file = require_pyarrow().parquet.ParquetWriter(path, self._schema, compression='zstd')
+            self._header = False
+        else:
+            self._header = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+            raw = open(path, 'ab' if append else 'wb')
+            self._file = gzip.GzipFile(fileobj=raw, mode='ab' if append else 'wb') if export_format == 'csv.gz' else raw
+            self._raw = raw
+
+    def write(self, df):
+        df = df[self.columns]
+        with self._lock:
+            if self.export_format == 'parquet':
+                if len(df):
+                    self._file.write_table(arrow_table(df, self._schema))
+            elif len(df) or self._header:
+                write_csv_chunks(df, self._file, self._header)
+                self._header = False
+            self.rows_written += len(df)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            if self.export_format == 'csv.gz':
+                self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,135 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app_utils import dblp_sparql_endpoint, get_scholarly_article_author_list, get_scholarly_article_list
+from batch import normalise_pid, pid_output_dir, read_pids, write_bundle
+from exports import export_formats
+
+manifest_file_name = "manifest.json"
+# dblp keeps adding records for recent years, so the year filter reaches this
+# many years back from the newest year already exported.
+default_lookback_years = 1
+
+
+def row_hash(values):
+    text = "\x1f".join("" if value is None or value != value else str(value) for value in values)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class ExportManifest:
+    # Per-PID record of the exported articles: a hash of each article row and
+    # of its author rows, keyed by dblp record id, plus the years seen.
+
+    def __init__(self, path):
+        self.path = path
+        self.articles = {}
+        self.authors = {}
+        self.years = {}
+        self.exported_at = None
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.articles = state.get('articles', {})
+            self.authors = state.get('authors', {})
+            self.years = state.get('years', {})
+            self.exported_at = state.get('exported_at')
+
+    def since_year(self, lookback_years=default_lookback_years):
+        years = [int(year) for year in self.years.values() if year]
+        if not years:
+            return None
+        return max(years) - lookback_years
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'exported_at': self.exported_at, 'articles': self.articles,
+                       'authors': self.authors, 'years': self.years}, f)
+        os.replace(tmp_path, self.path)
+
+
+def article_author_hashes(article_author_list):
+    hashes = {}
+    ordered = article_author_list.sort_values(by=['dblp_id', 'ordinal', 'name'])
+    for dblp_id, rows in ordered.groupby('dblp_id', sort=False):
+        hashes[dblp_id] = row_hash(rows[['ordinal', 'name']].itertuples(index=False, name=None))
+    return hashes
+
+def get_article_delta(dblp_person_id, manifest, lookback_years=default_lookback_years, endpoint=dblp_sparql_endpoint):
+    # Fetches only the records from the manifest's newest year (minus the
+    # lookback) onwards and keeps the articles that are new or whose row or
+    # author list changed since the last export.
+    since_year = manifest.since_year(lookback_years)
+    article_list = get_scholarly_article_list(dblp_person_id, endpoint, since_year=since_year)
+    article_author_list = get_scholarly_article_author_list(dblp_person_id, endpoint, since_year=since_year)
+
+    hash_columns = ['title', 'dblp_id', 'doi', 'pages', 'year', 'proceedings_id']
+    article_hashes = {row[1]: row_hash(row) for row in article_list[hash_columns].itertuples(index=False, name=None)}
+    author_hashes = article_author_hashes(article_author_list)
+
+    changed = {dblp_id for dblp_id, digest in article_hashes.items() if manifest.articles.get(dblp_id) != digest}
+    changed |= {dblp_id for dblp_id, digest in author_hashes.items() if manifest.authors.get(dblp_id) != digest}
+
+    delta = {
+        'scholarly_article_list': article_list[article_list['dblp_id'].isin(changed)].reset_index(drop=True),
+        'scholarly_article_author_list': article_author_list[article_author_list['dblp_id'].isin(changed)].reset_index(drop=True),
+    }
+    years = dict(zip(article_list['dblp_id'], article_list['year']))
+    return delta, article_hashes, author_hashes, years
+
+def export_delta(dblp_person_id, output_dir, lookback_years=default_lookback_years, endpoint=dblp_sparql_endpoint,
+                 export_format='csv'):
+    author_dir = pid_output_dir(output_dir, dblp_person_id)
+    os.makedirs(author_dir, exist_ok=True)
+    manifest = ExportManifest(os.path.join(author_dir, manifest_file_name))
+
+    delta, article_hashes, author_hashes, years = get_article_delta(dblp_person_id, manifest, lookback_years, endpoint)
+    write_bundle(output_dir, dblp_person_id, {f"{list_name}_delta": df for list_name, df in delta.items()}, export_format)
+
+    # Only written after the delta files, so a failed run is simply repeated.
+    manifest.articles.update(article_hashes)
+    manifest.authors.update(author_hashes)
+    manifest.years.update({dblp_id: year for dblp_id, year in years.items() if isinstance(year, str)})
+    manifest.exported_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    manifest.save()
+    return delta
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export only the dblp articles added or changed since the previous export of each author.")
+    parser.add_argument("pids", nargs="*", help="dblp person IDs, either as 'xx/yyyy' or as full https://dblp.org/pid/ URLs")
+    parser.add_argument("-f", "--pid-file", help="file with one dblp person ID per line ('-' for stdin)")
+    parser.add_argument("-o", "--output-dir", default="dblp_export", help="also holds the per-author manifest.json")
+    parser.add_argument("--lookback-years", type=int, default=default_lookback_years)
+    parser.add_argument("--max-workers", type=int, default=2)
+    parser.add_argument("--endpoint", default=dblp_sparql_endpoint)
+    parser.add_argument("--format", choices=list(export_formats), default="csv", help="output file format")
+    args = parser.parse_args(argv)
+
+    pids = list(args.pids)
+    if args.pid_file:
+        pids += read_pids(args.pid_file)
+    if not pids:
+        parser.error("no dblp person IDs given")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.max_workers)) as executor:
+        futures = {executor.submit(export_delta, normalise_pid(pid), args.output_dir, args.lookback_years, args.endpoint, args.format): pid
+                   for pid in dict.fromkeys(pids)}
+        for future in as_completed(futures):
+            pid = futures[future]
+            try:
+                delta = future.result()
+                print(f"{pid}: {len(delta['scholarly_article_list'])} new or changed articles")
+            except Exception as e:
+                failed += 1
+                print(f"{pid}: failed ({e})", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app_utils import (
+    get_coauthors_list,
+    get_proceedings_list,
+    get_scholarly_article_author_list,
+    get_scholarly_article_list,
+    query_version,
+)
+from result_store import get_result_store
+
+author_list_functions = {
+    'coauthor_list': get_coauthors_list,
+    'proceedings_list': get_proceedings_list,
+    'scholarly_article_list': get_scholarly_article_list,
+    'scholarly_article_author_list': get_scholarly_article_author_list,
+}
+
+default_max_workers = 8
+# Finished and failed jobs only need to outlive the polling of the sessions
+# waiting on them; the results themselves live in the result store.
+finished_job_ttl = 60
+
+
+def result_key(dblp_person_id, list_name):
+    return (dblp_person_id, list_name, query_version(list_name))
+
+def cached_result(dblp_person_id, list_name):
+    return get_result_store().get(result_key(dblp_person_id, list_name))
+
+
+class Job:
+    # State of one (dblp person id, list name) fetch, shared by every session
+    # that asks for it. Progress fields are updated from the worker thread.
+
+    def __init__(self, dblp_person_id, list_name):
+        self.dblp_person_id = dblp_person_id
+        self.list_name = list_name
+        self.status = 'pending'
+        self.pages_done = 0
+        self.rows_received = 0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def on_page(self, pages_done, rows_received):
+        self.pages_done = pages_done
+        self.rows_received = rows_received
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def describe(self):
+        if self.status == 'done':
+            return f"{self.list_name}: done, {len(self.result)} rows"
+        if self.status == 'failed':
+            return f"{self.list_name}: failed ({self.error})"
+        if self.status == 'running':
+            return f"{self.list_name}: {self.rows_received} rows received, {self.pages_done} pages"
+        return f"{self.list_name}: waiting"
+
+
+class JobRunner:
+    # Runs the blocking dblp queries on a bounded thread pool, independent of
+    # any Streamlit session. Submitting a key that is already pending, running
+    # or recently finished returns the existing job instead of starting a new
+    # one; a recently failed job is only replaced when retry_failed is set.
+
+    def __init__(self, max_workers=default_max_workers):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dblp-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, dblp_person_id, list_name, retry_failed=False):
+        key = (dblp_person_id, list_name)
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            if job is not None and not (retry_failed and job.status == 'failed'):
+                return job
+            job = Job(dblp_person_id, list_name)
+            self._jobs[key] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, dblp_person_id, list_name):
+        with self._lock:
+            return self._jobs.get((dblp_person_id, list_name))
+
+    def _run(self, job):
+        job.status = 'running'
+        try:
+            fetch = author_list_functions[job.list_name]
+            job.result = get_result_store().get_or_compute(
+                result_key(job.dblp_person_id, job.list_name),
+                lambda: fetch(job.dblp_person_id, on_page=job.on_page),
+            )
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            job._done.set()
+
+    def _prune(self):
+        now = time.time()
+        expired = [key for key, job in self._jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > finished_job_ttl]
+        for key in expired:
+            del self._jobs[key]
+
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+def get_job_runner():
+    global _job_runner
+    with _job_runner_lock:
+        if _job_runner is None:
+            _job_runner = JobRunner()
+        return _job_runner
@@ -0,0 +1,254 @@
+import argparse
+import gzip
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+import pandas as pd
+
+dblp_schema = "https://dblp.org/rdf/schema#"
+rdf_type = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+owl_same_as = "http://www.w3.org/2002/07/owl#sameAs"
+inproceedings_type = dblp_schema + "Inproceedings"
+
+# dblp schema predicates used by the queries in app_utils
+dblp_predicates = [
+    'hasSignature', 'signatureCreator', 'signatureOrdinal', 'primaryCreatorName',
+    'orcid', 'wikidata', 'webpage', 'title', 'isbn', 'yearOfPublication', 'doi',
+    'publishedBy', 'publishedInSeries', 'publishedInSeriesVolume', 'publishedAsPartOf',
+    'pagination',
+]
+predicate_names = {dblp_schema + name: name for name in dblp_predicates}
+predicate_names[owl_same_as] = 'sameAs'
+predicate_names[rdf_type] = 'type'
+
+ingest_batch_size = 100000
+
+triple_pattern = re.compile(r'^(<[^>]*>|_:\S+)\s+<([^>]*)>\s+(.*?)\s*\.\s*$')
+literal_pattern = re.compile(r'^"((?:[^"\\]|\\.)*)"(?:\^\^<[^>]*>|@[A-Za-z0-9-]+)?$')
+escape_pattern = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+escapes = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+
+def unescape_literal(value):
+    def replace(match):
+        escape = match.group(1)
+        if escape[0] in 'uU':
+            return chr(int(escape[1:], 16))
+        return escapes.get(escape, escape)
+    return escape_pattern.sub(replace, value)
+
+def parse_term(term):
+    if term.startswith('<'):
+        return term[1:-1]
+    if term.startswith('_:'):
+        return term
+    match = literal_pattern.match(term)
+    if match is None:
+        return None
+    return unescape_literal(match.group(1))
+
+def iter_triples(lines):
+    # Streams the triples of an N-Triples dump that the queries need, with
+    # predicates shortened to their local name.
+    for line in lines:
+        match = triple_pattern.match(line)
+        if match is None:
+            continue
+        predicate = predicate_names.get(match.group(2))
+        if predicate is None:
+            continue
+        obj = parse_term(match.group(3))
+        if obj is None:
+            continue
+        if predicate == 'type' and obj != inproceedings_type:
+            continue
+        yield parse_term(match.group(1)), predicate, obj
+
+def open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+def ingest_dump(dump_path, store_path):
+    # Loads the dump into a fresh SQLite file in constant memory; the indexes
+    # are built once all rows are in.
+    if os.path.exists(store_path):
+        os.remove(store_path)
+    conn = sqlite3.connect(store_path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('CREATE TABLE triples (s TEXT NOT NULL, p TEXT NOT NULL, o TEXT NOT NULL)')
+    count = 0
+    batch = []
+    with open_dump(dump_path) as lines:
+        for triple in iter_triples(lines):
+            batch.append(triple)
+            if len(batch) >= ingest_batch_size:
+                conn.executemany('INSERT INTO triples VALUES (?, ?, ?)', batch)
+                count += len(batch)
+                batch = []
+    if batch:
+        conn.executemany('INSERT INTO triples VALUES (?, ?, ?)', batch)
+        count += len(batch)
+    conn.commit()
+    conn.execute('CREATE INDEX triples_ps ON triples (p, s)')
+    conn.execute('CREATE INDEX triples_po ON triples (p, o)')
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    return count
+
+
+# The author's inproceedings papers, shared by every query below.
+author_papers_sql = """
+author_papers AS (
+    SELECT DISTINCT hs.s AS paper
+    FROM triples sc
+    JOIN triples hs ON hs.p = 'hasSignature' AND hs.o = sc.s
+    JOIN triples ty ON ty.p = 'type' AND ty.s = hs.s AND ty.o = :inproceedings
+    WHERE sc.p = 'signatureCreator' AND sc.o = :author
+)"""
+
+local_queries = {
+    'coauthor_list': """
+WITH """ + author_papers_sql + """,
+coauthors AS (
+    SELECT DISTINCT sc.o AS dblp_id
+    FROM author_papers ap
+    JOIN triples hs ON hs.p = 'hasSignature' AND hs.s = ap.paper
+    JOIN triples sc ON sc.p = 'signatureCreator' AND sc.s = hs.o
+)
+SELECT DISTINCT c.dblp_id, nm.o AS name, wd.o AS wikidata, orc.o AS orcid, orkg.o AS orkg,
+    gs.o AS scholar, acm.o AS acm, gh.o AS github, tw.o AS twitter
+FROM coauthors c
+JOIN triples nm ON nm.p = 'primaryCreatorName' AND nm.s = c.dblp_id
+LEFT JOIN triples orc ON orc.p = 'orcid' AND orc.s = c.dblp_id
+LEFT JOIN triples wd ON wd.p = 'wikidata' AND wd.s = c.dblp_id
+LEFT JOIN triples gs ON gs.p = 'webpage' AND gs.s = c.dblp_id AND gs.o LIKE 'https://scholar.google.com/%'
+LEFT JOIN triples gh ON gh.p = 'webpage' AND gh.s = c.dblp_id AND gh.o LIKE 'https://github.com/%'
+LEFT JOIN triples tw ON tw.p = 'webpage' AND tw.s = c.dblp_id AND tw.o LIKE 'https://twitter.com/%'
+LEFT JOIN triples acm ON acm.p = 'webpage' AND acm.s = c.dblp_id AND acm.o LIKE 'https://dl.acm.org/profile/%'
+LEFT JOIN triples orkg ON orkg.p = 'sameAs' AND orkg.s = c.dblp_id AND orkg.o LIKE 'https://orkg.org/resource/%'
+ORDER BY c.dblp_id
+""",
+    'proceedings_list': """
+WITH """ + author_papers_sql + """,
+proceedings AS (
+    SELECT DISTINCT po.o AS dblp_id
+    FROM author_papers ap
+    JOIN triples po ON po.p = 'publishedAsPartOf' AND po.s = ap.paper
+)
+SELECT DISTINCT pr.dblp_id, ti.o AS title, doi.o AS doi, isbn.o AS isbn, yr.o AS year,
+    se.o AS series, sv.o AS seriesVolume, pb.o AS publisher,
+    (SELECT group_concat(so.o || char(9) || nm.o, char(10))
+     FROM triples ps
+     JOIN triples sc ON sc.p = 'signatureCreator' AND sc.s = ps.o
+     JOIN triples so ON so.p = 'signatureOrdinal' AND so.s = ps.o
+     JOIN triples nm ON nm.p = 'primaryCreatorName' AND nm.s = sc.o
+     WHERE ps.p = 'hasSignature' AND ps.s = pr.dblp_id) AS editors
+FROM proceedings pr
+JOIN triples ti ON ti.p = 'title' AND ti.s = pr.dblp_id
+LEFT JOIN triples isbn ON isbn.p = 'isbn' AND isbn.s = pr.dblp_id
+LEFT JOIN triples yr ON yr.p = 'yearOfPublication' AND yr.s = pr.dblp_id
+LEFT JOIN triples doi ON doi.p = 'doi' AND doi.s = pr.dblp_id
+LEFT JOIN triples pb ON pb.p = 'publishedBy' AND pb.s = pr.dblp_id
+LEFT JOIN triples se ON se.p = 'publishedInSeries' AND se.s = pr.dblp_id
+LEFT JOIN triples sv ON sv.p = 'publishedInSeriesVolume' AND sv.s = pr.dblp_id
+ORDER BY pr.dblp_id
+""",
+    'scholarly_article_list': """
+WITH """ + author_papers_sql + """
+SELECT DISTINCT ap.paper AS dblp_id, ti.o AS title, doi.o AS doi, pg.o AS pages, yr.o AS year,
+    po.o AS proceedings_id
+FROM author_papers ap
+JOIN triples ti ON ti.p = 'title' AND ti.s = ap.paper
+JOIN triples po ON po.p = 'publishedAsPartOf' AND po.s = ap.paper
+LEFT JOIN triples doi ON doi.p = 'doi' AND doi.s = ap.paper
+LEFT JOIN triples pg ON pg.p = 'pagination' AND pg.s = ap.paper
+LEFT JOIN triples yr ON yr.p = 'yearOfPublication' AND yr.s = ap.paper
+WHERE :since_year IS NULL OR yr.o IS NULL OR yr.o >= :since_year
+""",
+    'scholarly_article_author_list': """
+WITH """ + author_papers_sql + """
+SELECT DISTINCT ap.paper AS dblp_id, ti.o AS title, so.o AS ordinal, nm.o AS name, sc.o AS author_dblp_id
+FROM author_papers ap
+JOIN triples ti ON ti.p = 'title' AND ti.s = ap.paper
+JOIN triples hs ON hs.p = 'hasSignature' AND hs.s = ap.paper
+JOIN triples sc ON sc.p = 'signatureCreator' AND sc.s = hs.o
+JOIN triples so ON so.p = 'signatureOrdinal' AND so.s = hs.o
+JOIN triples nm ON nm.p = 'primaryCreatorName' AND nm.s = sc.o
+LEFT JOIN triples yr ON yr.p = 'yearOfPublication' AND yr.s = ap.paper
+WHERE :since_year IS NULL OR yr.o IS NULL OR yr.o >= :since_year
+""",
+}
+
+
+class LocalDblpStore:
+    # Answers the per-author list queries from an ingested dblp dump. Returns
+    # the same raw columns as the SPARQL queries, so the process_* functions
+    # in app_utils apply unchanged.
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No ingested dblp store at {path}, run 'python src/local_store.py ingest' first")
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def query(self, list_name, dblp_person_id, var_list, since_year=None):
+        params = {
+            'author': dblp_person_id,
+            'inproceedings': inproceedings_type,
+            'since_year': None if since_year is None else str(int(since_year)),
+        }
+        cursor = self._connection().execute(local_queries[list_name], params)
+        columns = [description[0] for description in cursor.description]
+        df = pd.DataFrame(cursor.fetchall(), columns=columns, dtype=object)
+        return df[var_list]
+
+
+_local_store = None
+_local_store_path = os.environ.get('DBLP_LOCAL_STORE') or None
+_local_store_lock = threading.Lock()
+
+def get_local_store():
+    # The offline backend is used when DBLP_LOCAL_STORE (or set_local_store)
+    # points to an ingested dump; otherwise queries go to the SPARQL endpoint.
+    global _local_store
+    with _local_store_lock:
+        if _local_store is None and _local_store_path is not None:
+            _local_store = LocalDblpStore(_local_store_path)
+        return _local_store
+
+def set_local_store(path):
+    global _local_store, _local_store_path
+    with _local_store_lock:
+        _local_store_path = path
+        _local_store = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the offline dblp store used instead of the SPARQL endpoint.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest = subparsers.add_parser("ingest", help="ingest a dblp N-Triples dump (dblp.nt or dblp.nt.gz)")
+    ingest.add_argument("dump")
+    ingest.add_argument("store", help="SQLite file to create")
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        count = ingest_dump(args.dump, args.store)
+        print(f"ingested {count} triples into {args.store}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+metrics_logger = logging.getLogger('dblp_to_wikidata.metrics')
+
+_hooks = []
+_hooks_lock = threading.Lock()
+_profile_dir = os.environ.get('DBLP_PROFILE_DIR') or None
+# cProfile can only be active once per process; a stage that starts while
+# another one is profiled is only timed.
+_profiler_lock = threading.Lock()
+_log_handler = None
+
+
+def add_metrics_hook(hook):
+    # hook(record) is called after every timed stage with a dict holding at
+    # least 'stage' and 'seconds', plus fields such as 'rows' or 'list_name'.
+    with _hooks_lock:
+        _hooks.append(hook)
+
+def remove_metrics_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+def log_metrics_hook(record):
+    metrics_logger.info(json.dumps(record, default=str))
+
+def set_profile_dir(directory):
+    # Writes a cProfile dump of each timed stage to directory (None to stop).
+    global _profile_dir
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    _profile_dir = directory
+
+def emit(record):
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(record)
+        except Exception:
+            metrics_logger.exception("metrics hook failed")
+
+@contextmanager
+def timed(stage, **fields):
+    # Times the block and reports it to the hooks. The block can add fields
+    # to the yielded record, e.g. record['rows'] once the row count is known.
+    record = {'stage': stage, **fields}
+    if not _hooks and _profile_dir is None:
+        yield record
+        return
+    profiler = None
+    if _profile_dir is not None and _profiler_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+            path = os.path.join(_profile_dir, f"{stage}-{time.strftime('%Y%m%dT%H%M%S')}-{time.perf_counter_ns()}.prof")
+            profiler.dump_stats(path)
+            record['profile'] = path
+        emit(record)
+
+
+class StageStats:
+    # Metrics hook that sums time, calls and rows per stage.
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            stats = self.stages.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'rows': 0})
+            stats['calls'] += 1
+            stats['seconds'] += record['seconds']
+            stats['rows'] += record.get('rows') or 0
+
+    def summary(self):
+        with self._lock:
+            df = pd.DataFrame.from_dict(self.stages, orient='index', columns=['calls', 'seconds', 'rows'])
+        df.index.name = 'stage'
+        return df.sort_values(by='seconds', ascending=False)
+
+@contextmanager
+def collect_stage_stats():
+    stats = StageStats()
+    add_metrics_hook(stats)
+    try:
+        yield stats
+    finally:
+        remove_metrics_hook(stats)
+
+
+def enable_metrics_log(stream=None):
+    # Logs every timed stage as a JSON line to stream (stderr by default).
+    # The logger gets its own handler and level, since neither the app nor
+    # the command line tools configure logging.
+    global _log_handler
+    if _log_handler is None:
+        _log_handler = logging.StreamHandler(stream)
+        _log_handler.setFormatter(logging.Formatter('%(message)s'))
+        metrics_logger.addHandler(_log_handler)
+        metrics_logger.setLevel(logging.INFO)
+        metrics_logger.propagate = False
+        add_metrics_hook(log_metrics_hook)
+
+
+if os.environ.get('DBLP_METRICS_LOG'):
+    enable_metrics_log()
+if _profile_dir is not None:
+    set_profile_dir(_profile_dir)
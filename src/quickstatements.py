@@ -0,0 +1,427 @@
+import argparse
+import json
+import os
+import re
+import sys
+
+from app_utils import dblp_sparql_endpoint, get_scholarly_article_author_list, get_scholarly_article_list
+from batch import normalise_pid, pid_output_dir, read_pids
+from reconciliation import link_article_authors, link_article_proceedings, link_articles, load_map
+from wikidata_index import get_wikidata_index, prefill_articles
+
+schema_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'open_refine_schemas')
+scholarly_article_schema_path = os.path.join(schema_dir, 'scholarly_article_schema.json')
+
+# Author statements on the article item, evaluated once per article-author
+# row, in the same expression format as the OpenRefine schema: P50 (author)
+# for reconciled authors, P2093 (author name string) for the others, both
+# with the author's position as P1545 (series ordinal).
+author_statement_groups = [
+    {
+        'property': {'type': 'wbpropconstant', 'pid': pid, 'datatype': datatype},
+        'statements': [{
+            'value': {'type': value_type, 'columnName': column},
+            'qualifiers': [{
+                'prop': {'type': 'wbpropconstant', 'pid': 'P1545', 'datatype': 'string'},
+                'value': {'type': 'wbstringvariable', 'columnName': 'ordinal'},
+            }],
+            'references': [],
+            'mode': 'add_or_merge',
+        }],
+    }
+    for pid, datatype, value_type, column in [
+        ('P50', 'wikibase-item', 'wbentityvariable', 'author_wd_id'),
+        ('P2093', 'string', 'wbstringvariable', 'author_name_string'),
+    ]
+]
+
+# Value expression types accepted for each property datatype.
+datatype_value_types = {
+    'wikibase-item': {'wbentityvariable', 'wbentityidvalueconstant'},
+    'string': {'wbstringvariable', 'wbstringconstant'},
+    'external-id': {'wbstringvariable', 'wbstringconstant'},
+    'monolingualtext': {'wbmonolingualexpr'},
+    'time': {'wbdatevariable', 'wbdateconstant'},
+}
+supported_modes = {'add', 'add_or_merge'}
+name_desc_commands = {
+    'LABEL': 'L', 'LABEL_IF_NEW': 'L',
+    'DESCRIPTION': 'D', 'DESCRIPTION_IF_NEW': 'D',
+    'ALIAS': 'A',
+}
+qid_pattern = re.compile(r'^Q[1-9][0-9]*$')
+pid_pattern = re.compile(r'^P[1-9][0-9]*$')
+date_pattern = re.compile(r'^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?$')
+gregorian_calendar = "http://www.wikidata.org/entity/Q1985727"
+
+output_formats = {
+    'quickstatements': '.qs',
+    'wbeditentity': '.jsonl',
+}
+default_chunk_size = 500
+
+
+def load_schema(path=scholarly_article_schema_path):
+    with open(path) as f:
+        schema = json.load(f)
+    return schema.get('schema', schema)
+
+def expression_columns(expression):
+    # Columns read by a value expression, including nested ones.
+    columns = set()
+    if 'columnName' in expression:
+        columns.add(expression['columnName'])
+    for key in ('value', 'language'):
+        if isinstance(expression.get(key), dict):
+            columns |= expression_columns(expression[key])
+    return columns
+
+def validate_statement_groups(statement_groups, columns, where):
+    problems = []
+    for group in statement_groups:
+        prop = group.get('property', {})
+        pid = prop.get('pid', '')
+        if prop.get('type') != 'wbpropconstant' or not pid_pattern.match(pid):
+            problems.append(f"{where}: unsupported property {prop}")
+            continue
+        allowed = datatype_value_types.get(prop.get('datatype'))
+        if allowed is None:
+            problems.append(f"{where}: {pid} has unsupported datatype {prop.get('datatype')!r}")
+            continue
+        for statement in group.get('statements', []):
+            value = statement.get('value', {})
+            if value.get('type') not in allowed:
+                problems.append(f"{where}: {pid} ({prop['datatype']}) cannot take a {value.get('type')} value")
+            if statement.get('mode', 'add_or_merge') not in supported_modes:
+                problems.append(f"{where}: {pid} uses unsupported mode {statement.get('mode')!r}")
+            missing = expression_columns(value) - set(columns)
+            for snak in statement.get('qualifiers', []) + [snak for reference in statement.get('references', [])
+                                                            for snak in reference.get('snaks', [])]:
+                missing |= expression_columns(snak.get('value', {})) - set(columns)
+            if missing:
+                problems.append(f"{where}: {pid} reads missing column(s) {', '.join(sorted(missing))}")
+    return problems
+
+def validate_schema(schema, article_columns, author_columns=None):
+    # Checks that the schema only uses what this generator can evaluate and
+    # that every column it reads exists, so a bad schema fails before any
+    # output is written.
+    problems = []
+    entity_edits = schema.get('entityEdits', [])
+    if len(entity_edits) != 1:
+        problems.append(f"expected one entity edit, found {len(entity_edits)}")
+    for edit in entity_edits:
+        subject = edit.get('subject', {})
+        if subject.get('type') != 'wbentityvariable' or subject.get('columnName') not in article_columns:
+            problems.append(f"subject must be an entity column of the article list, got {subject}")
+        problems += validate_statement_groups(edit.get('statementGroups', []), article_columns, 'article')
+        for name_desc in edit.get('nameDescs', []):
+            if name_desc.get('name_type') not in name_desc_commands:
+                problems.append(f"unsupported name type {name_desc.get('name_type')!r}")
+            missing = expression_columns(name_desc.get('value', {})) - set(article_columns)
+            if missing:
+                problems.append(f"{name_desc.get('name_type')} reads missing column(s) {', '.join(sorted(missing))}")
+    if author_columns is not None:
+        problems += validate_statement_groups(author_statement_groups, author_columns, 'author')
+    if problems:
+        raise ValueError("Schema does not match the article lists:\n  " + "\n  ".join(problems))
+
+
+def cell(row, column):
+    value = row.get(column)
+    if value is None or value != value:
+        return None
+    value = " ".join(str(value).split())
+    return value or None
+
+def evaluate_string(expression, row):
+    if expression['type'] == 'wbstringconstant':
+        return expression['value']
+    return cell(row, expression['columnName'])
+
+def evaluate_value(expression, row):
+    # Returns (datatype, value) or None when the row has no usable value,
+    # in which case the statement is skipped, as OpenRefine does.
+    value_type = expression['type']
+    if value_type == 'wbentityidvalueconstant':
+        return 'item', expression['id']
+    if value_type == 'wbentityvariable':
+        value = cell(row, expression['columnName'])
+        # Cells that were not reconciled to an item (e.g. a dblp record id)
+        # cannot be linked.
+        return ('item', value) if value and qid_pattern.match(value) else None
+    if value_type in ('wbstringvariable', 'wbstringconstant'):
+        value = evaluate_string(expression, row)
+        return ('string', value) if value else None
+    if value_type == 'wbmonolingualexpr':
+        language = expression['language']['id']
+        text = evaluate_string(expression['value'], row)
+        return ('monolingualtext', (language, text)) if text else None
+    if value_type in ('wbdatevariable', 'wbdateconstant'):
+        value = expression['value'] if value_type == 'wbdateconstant' else cell(row, expression['columnName'])
+        match = date_pattern.match(value or '')
+        if match is None:
+            return None
+        year, month, day = match.groups()
+        precision = 11 if day else 10 if month else 9
+        return 'time', (f"+{year}-{month or '00'}-{day or '00'}T00:00:00Z", precision)
+    raise ValueError(f"Unsupported value expression {value_type!r}")
+
+def evaluate_statements(statement_groups, row):
+    statements = []
+    for group in statement_groups:
+        pid = group['property']['pid']
+        for statement in group['statements']:
+            value = evaluate_value(statement['value'], row)
+            if value is None:
+                continue
+            qualifiers = [(snak['prop']['pid'], evaluate_value(snak['value'], row)) for snak in statement.get('qualifiers', [])]
+            references = [[(snak['prop']['pid'], evaluate_value(snak['value'], row)) for snak in reference.get('snaks', [])]
+                          for reference in statement.get('references', [])]
+            statements.append((
+                pid,
+                value,
+                [(qualifier_pid, qualifier) for qualifier_pid, qualifier in qualifiers if qualifier is not None],
+                [[(snak_pid, snak) for snak_pid, snak in reference if snak is not None] for reference in references],
+            ))
+    return statements
+
+def is_resolved(article_list, schema=None):
+    # Boolean Series: the article's subject cell is already a Wikidata QID.
+    schema = load_schema() if schema is None else schema
+    subject_column = schema['entityEdits'][0]['subject']['columnName']
+    return article_list[subject_column].map(lambda value: bool(isinstance(value, str) and qid_pattern.match(value.strip())))
+
+def iter_items(article_list, article_author_list=None, schema=None, new_items=False):
+    # Applies the schema to each article row, plus the author statements of
+    # its article-author rows. Yields one item per article: its QID (None for
+    # a new item), label/description/alias terms and statements. Only the
+    # articles already resolved to a QID are edited; with new_items, only the
+    # unresolved ones are yielded instead, as items to create.
+    schema = load_schema() if schema is None else schema
+    author_columns = None if article_author_list is None else list(article_author_list.columns)
+    validate_schema(schema, list(article_list.columns), author_columns)
+    edit = schema['entityEdits'][0]
+
+    authors_by_article = {}
+    if article_author_list is not None:
+        ordered = article_author_list.assign(_position=article_author_list['ordinal'].astype(float))
+        for row in ordered.sort_values(by=['dblp_id', '_position']).to_dict('records'):
+            authors_by_article.setdefault(row['dblp_id'], []).append(row)
+
+    selected = article_list[is_resolved(article_list, schema) != new_items]
+    for row in selected.to_dict('records'):
+        subject = cell(row, edit['subject']['columnName'])
+        qid = subject if subject and qid_pattern.match(subject) else None
+        terms = []
+        for name_desc in edit.get('nameDescs', []):
+            name_type = name_desc['name_type']
+            if qid is not None and name_type.endswith('_IF_NEW'):
+                continue
+            term = evaluate_value(name_desc['value'], row)
+            if term is not None:
+                language, text = term[1]
+                terms.append((name_desc_commands[name_type], language, text))
+        statements = evaluate_statements(edit.get('statementGroups', []), row)
+        for author_row in authors_by_article.get(row.get('dblp_id'), []):
+            statements += evaluate_statements(author_statement_groups, author_row)
+        yield {'id': qid, 'terms': terms, 'statements': statements}
+
+
+def quickstatements_value(value):
+    datatype, value = value
+    if datatype == 'item':
+        return value
+    if datatype == 'string':
+        return '"' + value.replace('"', "'") + '"'
+    if datatype == 'monolingualtext':
+        language, text = value
+        return f'{language}:"' + text.replace('"', "'") + '"'
+    if datatype == 'time':
+        time_value, precision = value
+        return f"{time_value}/{precision}"
+    raise ValueError(f"Unsupported datatype {datatype!r}")
+
+def quickstatements_commands(item):
+    # QuickStatements V1: new items are created with CREATE and edited as LAST.
+    lines = []
+    subject = item['id']
+    if subject is None:
+        lines.append("CREATE")
+        subject = "LAST"
+    for command, language, text in item['terms']:
+        lines.append(f"{subject}\t{command}{language}\t" + quickstatements_value(('string', text)))
+    for pid, value, qualifiers, references in item['statements']:
+        parts = [subject, pid, quickstatements_value(value)]
+        for qualifier_pid, qualifier in qualifiers:
+            parts += [qualifier_pid, quickstatements_value(qualifier)]
+        for reference in references:
+            for snak_pid, snak in reference:
+                parts += ['S' + snak_pid[1:], quickstatements_value(snak)]
+        lines.append("\t".join(parts))
+    return "\n".join(lines) + "\n"
+
+def datavalue(value):
+    datatype, value = value
+    if datatype == 'item':
+        return {'type': 'wikibase-entityid', 'value': {'entity-type': 'item', 'numeric-id': int(value[1:]), 'id': value}}
+    if datatype == 'string':
+        return {'type': 'string', 'value': value}
+    if datatype == 'monolingualtext':
+        language, text = value
+        return {'type': 'monolingualtext', 'value': {'language': language, 'text': text}}
+    if datatype == 'time':
+        time_value, precision = value
+        return {'type': 'time', 'value': {'time': time_value, 'timezone': 0, 'before': 0, 'after': 0,
+                                          'precision': precision, 'calendarmodel': gregorian_calendar}}
+    raise ValueError(f"Unsupported datatype {datatype!r}")
+
+def snak(pid, value):
+    return {'snaktype': 'value', 'property': pid, 'datavalue': datavalue(value)}
+
+def snak_groups(snaks):
+    groups = {}
+    for pid, value in snaks:
+        groups.setdefault(pid, []).append(snak(pid, value))
+    return groups
+
+def wbeditentity_data(item):
+    # The 'data' parameter of a wbeditentity call with new=item. wbeditentity
+    # adds every claim without a GUID as a new claim instead of merging it, so
+    # existing items would get duplicate statements; they are left to
+    # QuickStatements, which skips statements that are already there.
+    if item['id'] is not None:
+        raise ValueError(f"wbeditentity output can only create new items, {item['id']} already exists; "
+                         "use the quickstatements format to edit existing items")
+    data = {}
+    term_keys = {'L': 'labels', 'D': 'descriptions', 'A': 'aliases'}
+    for command, language, text in item['terms']:
+        term = {'language': language, 'value': text}
+        if command == 'A':
+            data.setdefault('aliases', {}).setdefault(language, []).append(term)
+        else:
+            data.setdefault(term_keys[command], {})[language] = term
+    claims = []
+    for pid, value, qualifiers, references in item['statements']:
+        claim = {'mainsnak': snak(pid, value), 'type': 'statement', 'rank': 'normal'}
+        if qualifiers:
+            claim['qualifiers'] = snak_groups(qualifiers)
+        if references:
+            claim['references'] = [{'snaks': snak_groups(reference)} for reference in references if reference]
+        claims.append(claim)
+    data['claims'] = claims
+    return data
+
+def iter_output(items, output_format='quickstatements'):
+    # One text block per item: QuickStatements commands or a JSON line.
+    for item in items:
+        if output_format == 'quickstatements':
+            yield quickstatements_commands(item)
+        elif output_format == 'wbeditentity':
+            yield json.dumps(wbeditentity_data(item), ensure_ascii=False) + "\n"
+        else:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {', '.join(output_formats)}")
+
+def write_chunks(blocks, path_stem, output_format='quickstatements', chunk_size=default_chunk_size):
+    # Streams the blocks into numbered files of at most chunk_size items,
+    # small enough to be submitted as one QuickStatements batch each.
+    extension = output_formats[output_format]
+    paths = []
+    f = None
+    try:
+        for i, block in enumerate(blocks):
+            if i % chunk_size == 0:
+                if f is not None:
+                    f.close()
+                paths.append(f"{path_stem}-{len(paths) + 1:04d}{extension}")
+                f = open(paths[-1], 'w', encoding='utf-8')
+            f.write(block)
+    finally:
+        if f is not None:
+            f.close()
+    return paths
+
+
+def resolve_articles(article_list, article_map=None, index=None):
+    # Links the articles to existing Wikidata items, from an uploaded article
+    # map first and then by dblp publication ID (P8978) or DOI (P356) in the
+    # Wikidata index, so known articles are edited rather than created again.
+    article_list = link_articles(article_list, article_map)
+    index = get_wikidata_index() if index is None else index
+    if index is not None:
+        article_list = prefill_articles(article_list, index)
+    return article_list
+
+def author_lists(dblp_person_id, endpoint=dblp_sparql_endpoint, coauthor_map=None, proceedings_map=None, article_map=None):
+    article_list = link_article_proceedings(get_scholarly_article_list(dblp_person_id, endpoint), proceedings_map)
+    article_list = resolve_articles(article_list, article_map)
+    article_author_list = link_article_authors(get_scholarly_article_author_list(dblp_person_id, endpoint), coauthor_map)
+    return article_list, article_author_list
+
+def read_map_file(kind, path):
+    if path is None:
+        return None
+    with open(path, 'rb') as f:
+        return load_map(kind, f.read())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate QuickStatements or wbeditentity batches for the scholarly articles of dblp authors.")
+    parser.add_argument("pids", nargs="*", help="dblp person IDs, either as 'xx/yyyy' or as full https://dblp.org/pid/ URLs")
+    parser.add_argument("-f", "--pid-file", help="file with one dblp person ID per line ('-' for stdin)")
+    parser.add_argument("-o", "--output-dir", default="dblp_export")
+    parser.add_argument("--format", choices=list(output_formats), default="quickstatements",
+                        help="wbeditentity only writes new items and needs --create-new")
+    parser.add_argument("--chunk-size", type=int, default=default_chunk_size, help="articles per output file")
+    parser.add_argument("--schema", default=scholarly_article_schema_path, help="OpenRefine Wikibase schema to apply")
+    parser.add_argument("--coauthor-map", help="OpenRefine coauthor reconciliation CSV (dblp_id, name, wd_id)")
+    parser.add_argument("--proceedings-map", help="OpenRefine proceedings reconciliation CSV (title, dblp_id, wd_id)")
+    parser.add_argument("--article-map", help="OpenRefine scholarly article reconciliation CSV (title, dblp_id, wd_id)")
+    parser.add_argument("--create-new", action="store_true",
+                        help="also write the articles not found on Wikidata, as new items, to scholarly_articles_new-*")
+    parser.add_argument("--endpoint", default=dblp_sparql_endpoint)
+    args = parser.parse_args(argv)
+
+    pids = list(args.pids)
+    if args.pid_file:
+        pids += read_pids(args.pid_file)
+    if not pids:
+        parser.error("no dblp person IDs given")
+    # wbeditentity would add the statements of existing items a second time.
+    edit_existing = args.format != 'wbeditentity'
+    if not edit_existing and not args.create_new:
+        parser.error("--format wbeditentity can only create new items, use it with --create-new")
+
+    schema = load_schema(args.schema)
+    coauthor_map = read_map_file('coauthor', args.coauthor_map)
+    proceedings_map = read_map_file('proceedings', args.proceedings_map)
+    article_map = read_map_file('article', args.article_map)
+    failed = 0
+    for dblp_person_id in dict.fromkeys(normalise_pid(pid) for pid in pids):
+        try:
+            author_dir = pid_output_dir(args.output_dir, dblp_person_id)
+            os.makedirs(author_dir, exist_ok=True)
+            article_list, article_author_list = author_lists(dblp_person_id, args.endpoint, coauthor_map, proceedings_map, article_map)
+            paths = []
+            if edit_existing:
+                items = iter_items(article_list, article_author_list, schema)
+                paths += write_chunks(iter_output(items, args.format), os.path.join(author_dir, 'scholarly_articles'),
+                                      args.format, max(1, args.chunk_size))
+            unresolved = int((~is_resolved(article_list, schema)).sum())
+            existing = len(article_list) - unresolved
+            if args.create_new:
+                new_items = iter_items(article_list, article_author_list, schema, new_items=True)
+                paths += write_chunks(iter_output(new_items, args.format), os.path.join(author_dir, 'scholarly_articles_new'),
+                                      args.format, max(1, args.chunk_size))
+                note = f"{unresolved} new"
+            else:
+                note = f"{unresolved} not on Wikidata skipped, see --create-new"
+            existing_note = f"{existing} existing" if edit_existing else f"{existing} existing skipped, use the quickstatements format"
+            print(f"{dblp_person_id}: {len(paths)} file(s) in {author_dir} ({existing_note}, {note})")
+        except Exception as e:
+            failed += 1
+            print(f"{dblp_person_id}: failed ({e})", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from app_utils import dblp_pid_prefix, dblp_rec_prefix
+
+# Parsed maps kept per (kind, content hash), so a rerun with the same upload
+# does not parse it again.
+max_cached_maps = 8
+
+
+def normalise_name(names):
+    # NFKC, case-folded and with collapsed whitespace; dblp's homonym
+    # suffixes ("Wei Wang 0001") are kept since they tell authors apart.
+    return names.str.normalize('NFKC').str.casefold().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+def unique_index(keys, values):
+    # key -> value for keys that map to exactly one value; ambiguous keys are
+    # dropped rather than resolved arbitrarily.
+    pairs = pd.DataFrame({'key': keys, 'value': values}).dropna().drop_duplicates()
+    pairs = pairs[~pairs['key'].duplicated(keep=False)]
+    return pd.Series(pairs['value'].to_numpy(), index=pd.Index(pairs['key'].to_numpy()), dtype=object)
+
+def read_map_csv(data, columns):
+    df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, na_values=[''])
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise ValueError(f"Mapping file is missing the column(s): {', '.join(missing)}")
+    df = df[columns]
+    df = df[df['wd_id'].notna() & (df['wd_id'].str.strip() != '')]
+    df['wd_id'] = df['wd_id'].str.strip()
+    return df.reset_index(drop=True)
+
+
+class CoauthorMap:
+    # OpenRefine coauthor reconciliation (dblp_id, name, wd_id), indexed by
+    # dblp person id with the normalised name as fallback.
+
+    columns = ['dblp_id', 'name', 'wd_id']
+
+    def __init__(self, df):
+        self.df = df
+        pids = df['dblp_id'].str.strip().str.removeprefix(dblp_pid_prefix)
+        self.by_pid = unique_index(pids, df['wd_id'])
+        self.by_name = unique_index(normalise_name(df['name']), df['wd_id'])
+
+    def lookup(self, author_dblp_ids, names):
+        wd_ids = author_dblp_ids.map(self.by_pid)
+        unresolved = wd_ids.isna()
+        if unresolved.any():
+            wd_ids = wd_ids.where(~unresolved, normalise_name(names[unresolved]).map(self.by_name))
+        return wd_ids.astype(object).where(wd_ids.notna(), None)
+
+
+class ProceedingsMap:
+    # OpenRefine proceedings reconciliation (title, dblp_id, wd_id), indexed
+    # by dblp record id.
+
+    columns = ['title', 'dblp_id', 'wd_id']
+
+    def __init__(self, df):
+        self.df = df
+        self.by_dblp_id = unique_index(df['dblp_id'].str.strip().str.removeprefix(dblp_rec_prefix), df['wd_id'])
+
+    def lookup(self, proceedings_ids):
+        wd_ids = proceedings_ids.map(self.by_dblp_id)
+        return wd_ids.astype(object).where(wd_ids.notna(), None)
+
+
+class ArticleMap:
+    # OpenRefine scholarly article reconciliation (title, dblp_id, wd_id),
+    # indexed by dblp record id.
+
+    columns = ['title', 'dblp_id', 'wd_id']
+
+    def __init__(self, df):
+        self.df = df
+        self.by_dblp_id = unique_index(df['dblp_id'].str.strip().str.removeprefix(dblp_rec_prefix), df['wd_id'])
+
+    def lookup(self, article_ids):
+        wd_ids = article_ids.map(self.by_dblp_id)
+        return wd_ids.astype(object).where(wd_ids.notna(), None)
+
+
+map_kinds = {
+    'coauthor': CoauthorMap,
+    'proceedings': ProceedingsMap,
+    'article': ArticleMap,
+}
+_map_cache = OrderedDict()
+_map_cache_lock = threading.Lock()
+
+def load_map(kind, data):
+    map_class = map_kinds[kind]
+    key = (kind, hashlib.sha256(data).hexdigest())
+    with _map_cache_lock:
+        if key in _map_cache:
+            _map_cache.move_to_end(key)
+            return _map_cache[key]
+    reconciliation_map = map_class(read_map_csv(data, map_class.columns))
+    with _map_cache_lock:
+        _map_cache[key] = reconciliation_map
+        while len(_map_cache) > max_cached_maps:
+            _map_cache.popitem(last=False)
+    return reconciliation_map
+
+def link_article_authors(article_author_list, coauthor_map=None):
+    if coauthor_map is None:
+        author_wd_id = pd.Series(None, index=article_author_list.index, dtype=object)
+    else:
+        author_wd_id = coauthor_map.lookup(article_author_list['author_dblp_id'], article_author_list['name'])
+    return article_author_list.assign(
+        author_wd_id=author_wd_id,
+        author_name_string=article_author_list['name'].where(author_wd_id.isna(), None),
+    )
+
+def link_article_proceedings(article_list, proceedings_map=None):
+    if proceedings_map is None:
+        return article_list
+    return article_list.assign(proceedings_id=proceedings_map.lookup(article_list['proceedings_id']))
+
+def link_articles(article_list, article_map=None):
+    # wd_id of the articles already on Wikidata; entity_to_link becomes the
+    # QID for those and stays the title for the rest.
+    if article_map is None:
+        return article_list
+    wd_id = article_map.lookup(article_list['dblp_id'])
+    return article_list.assign(
+        entity_to_link=wd_id.where(wd_id.notna(), article_list['entity_to_link']),
+        wd_id=wd_id,
+    )
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+default_cache_path = os.environ.get(
+    'DBLP_CACHE_PATH',
+    os.path.join(os.path.expanduser('~'), '.cache', 'dblp-to-wikidata', 'responses.sqlite'),
+)
+default_max_bytes = int(os.environ.get('DBLP_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# A hit only writes its access time back when the stored one is older than
+# this many seconds, so most reads do not touch the disk. Eviction order is
+# accurate to the same resolution.
+last_access_resolution = 60
+
+
+class ResponseCache:
+    # zlib-compressed JSON in SQLite, keyed by a hash of the request, with a
+    # per-entry TTL and LRU eviction once payloads exceed max_bytes.
+
+    def __init__(self, path=default_cache_path, max_bytes=default_max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # With WAL, NORMAL only syncs at checkpoints; a crash can lose the last
+        # few cached responses but never corrupts the file.
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(namespace, *parts):
+        digest = hashlib.sha256(namespace.encode('utf-8'))
+        for part in parts:
+            digest.update(b'\0')
+            digest.update(part.encode('utf-8'))
+        return f"{namespace}:{digest.hexdigest()}"
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, expires_at, last_access FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            if now - row[2] > last_access_resolution:
+                self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key, value, ttl):
+        payload = zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, payload, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)',
+                (key, payload, len(payload), now + ttl, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute('DELETE FROM responses WHERE expires_at < ?', (now,))
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+
+_response_cache = None
+_response_cache_disabled = os.environ.get('DBLP_CACHE_DISABLED', '') not in ('', '0')
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache_disabled:
+            return None
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+def set_response_cache(cache):
+    # Pass None to disable caching entirely.
+    global _response_cache, _response_cache_disabled
+    with _response_cache_lock:
+        _response_cache = cache
+        _response_cache_disabled = cache is None
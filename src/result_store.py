@@ -0,0 +1,193 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+default_max_bytes = int(os.environ.get('DBLP_RESULT_STORE_MAX_BYTES', 512 * 1024 * 1024))
+# Set to a directory to share results between worker processes.
+default_store_dir = os.environ.get('DBLP_RESULT_STORE_DIR') or None
+default_ttl = 24 * 60 * 60
+# A lock file older than this is treated as left behind by a dead process.
+stale_lock_seconds = 30 * 60
+lock_poll_interval = 0.5
+
+
+def frame_size(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResultStore:
+    # Process-wide store for the final DataFrames, keyed by
+    # (dblp person id, list name, query version). Concurrent requests for the
+    # same key share one computation (single flight). Entries are evicted
+    # least recently used first once their memory footprint exceeds
+    # max_bytes. With store_dir set, results are also pickled to disk and a
+    # lock file makes the single flight hold across processes.
+    # Stored frames are shared: callers must not modify them in place.
+
+    def __init__(self, max_bytes=default_max_bytes, store_dir=default_store_dir, ttl=default_ttl):
+        self.max_bytes = max_bytes
+        self.store_dir = store_dir
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        if store_dir is not None:
+            os.makedirs(store_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, df = entry
+                if time.time() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return df
+                self._remove(key)
+        df = self._load(key)
+        if df is not None:
+            with self._lock:
+                self.hits += 1
+                self._put(key, df)
+        return df
+
+    def get_or_compute(self, key, compute):
+        df = self.get(key)
+        if df is not None:
+            return df
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+            if owner:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                self.misses += 1
+        if not owner:
+            in_flight.event.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            in_flight.result = self._compute_once(key, compute)
+            return in_flight.result
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.event.set()
+
+    def discard(self, key):
+        with self._lock:
+            self._remove(key)
+        if self.store_dir is not None:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'bytes': self._total_bytes, 'in_flight': len(self._in_flight)}
+
+    def _compute_once(self, key, compute):
+        if self.store_dir is None:
+            df = compute()
+        else:
+            df = self._compute_with_file_lock(key, compute)
+        with self._lock:
+            self._put(key, df)
+        return df
+
+    def _compute_with_file_lock(self, key, compute):
+        lock_path = self._path(key) + ".lock"
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                df = self._load(key)
+                if df is not None:
+                    return df
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > stale_lock_seconds:
+                        os.remove(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(lock_poll_interval)
+        try:
+            os.close(fd)
+            df = self._load(key)
+            if df is None:
+                df = compute()
+                self._save(key, df)
+            return df
+        finally:
+            os.remove(lock_path)
+
+    def _put(self, key, df):
+        if key in self._entries:
+            self._remove(key)
+        size = frame_size(df)
+        self._entries[key] = (time.time(), df)
+        self._sizes[key] = size
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        if key in self._entries:
+            del self._entries[key]
+            self._total_bytes -= self._sizes.pop(key)
+
+    def _path(self, key):
+        name = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.store_dir, name + ".pkl")
+
+    def _load(self, key):
+        if self.store_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _save(self, key, df):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+def get_result_store():
+    global _result_store
+    with _result_store_lock:
+        if _result_store is None:
+            _result_store = ResultStore()
+        return _result_store
@@ -0,0 +1,278 @@
+import argparse
+import bz2
+import csv
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+import pandas as pd
+
+from app_utils import wikidata_entity_prefix
+
+# Wikidata identifier properties -> key kind in the index
+index_properties = {
+    'P496': 'orcid',
+    'P2456': 'dblp_pid',
+    'P1960': 'scholar',
+    'P356': 'doi',
+    'P212': 'isbn',
+    'P957': 'isbn',
+    'P8978': 'dblp_id',
+}
+# Coauthor and proceedings list column -> key kind, tried in this order;
+# the first identifier that resolves to a single item wins.
+coauthor_keys = [('dblp_id', 'dblp_pid'), ('orcid', 'orcid'), ('scholar', 'scholar')]
+proceedings_keys = [('dblp_id', 'dblp_id'), ('doi', 'doi'), ('isbn', 'isbn')]
+article_keys = [('dblp_id', 'dblp_id'), ('doi', 'doi')]
+
+build_batch_size = 100000
+lookup_batch_size = 500
+qid_pattern = re.compile(r'^Q[1-9][0-9]*$')
+
+
+def isbn13(isbn):
+    if len(isbn) != 10:
+        return isbn
+    if not isbn[:9].isdigit():
+        # Malformed ISBN-10 (X only belongs in the check digit): unresolvable.
+        return None
+    digits = "978" + isbn[:9]
+    check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10) % 10
+    return digits + str(check)
+
+def normalise_isbn(value):
+    # Hyphens and spaces differ between dblp and Wikidata, and an ISBN-10 is
+    # matched as its ISBN-13.
+    return isbn13(re.sub(r'[^0-9X]', '', value.upper()))
+
+key_normalisers = {
+    'orcid': lambda value: value.strip().upper(),
+    'dblp_pid': lambda value: value.strip().strip('/'),
+    'scholar': lambda value: value.strip().split('&', 1)[0],
+    'doi': lambda value: value.strip().upper(),
+    'isbn': normalise_isbn,
+    'dblp_id': lambda value: value.strip().strip('/'),
+}
+
+def normalise_key(kind, value):
+    if not isinstance(value, str):
+        return None
+    return key_normalisers[kind](value) or None
+
+
+def open_extract(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8', newline='')
+
+def iter_dump_ids(lines):
+    # Wikidata JSON dump: one entity per line inside a JSON array. Lines
+    # without any of the indexed properties are skipped before parsing.
+    markers = [f'"{pid}"' for pid in index_properties]
+    for line in lines:
+        if not any(marker in line for marker in markers):
+            continue
+        entity = json.loads(line.rstrip().rstrip(','))
+        qid = entity.get('id', '')
+        if not qid_pattern.match(qid):
+            continue
+        for pid, claims in entity.get('claims', {}).items():
+            if pid not in index_properties:
+                continue
+            for claim in claims:
+                value = claim.get('mainsnak', {}).get('datavalue', {}).get('value')
+                if claim.get('rank') != 'deprecated' and isinstance(value, str):
+                    yield pid, value, qid
+
+def iter_csv_ids(lines):
+    # CSV or TSV extract with item, property and value columns, e.g. a
+    # Wikidata Query Service result; item and property may be entity URIs.
+    sample = lines.readline()
+    dialect = csv.excel_tab if '\t' in sample else csv.excel
+    header = next(csv.reader([sample], dialect))
+    columns = [column.strip().lstrip('?') for column in header]
+    missing = {'item', 'property', 'value'} - set(columns)
+    if missing:
+        raise ValueError(f"Extract is missing the column(s): {', '.join(sorted(missing))}")
+    item, prop, value = columns.index('item'), columns.index('property'), columns.index('value')
+    for row in csv.reader(lines, dialect):
+        if len(row) < len(columns):
+            continue
+        qid = row[item].removeprefix(wikidata_entity_prefix)
+        pid = row[prop].rsplit('/', 1)[-1]
+        if pid in index_properties and qid_pattern.match(qid):
+            yield pid, row[value], qid
+
+def iter_extract_ids(lines, path):
+    if re.search(r'\.json(\.gz|\.bz2)?$', path):
+        return iter_dump_ids(lines)
+    return iter_csv_ids(lines)
+
+def build_index(extract_path, index_path):
+    # Builds the SQLite lookup table in constant memory; the index on
+    # (kind, key) is created once all rows are in.
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    conn = sqlite3.connect(index_path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('CREATE TABLE ids (kind TEXT NOT NULL, key TEXT NOT NULL, qid TEXT NOT NULL)')
+    count = 0
+    batch = []
+    with open_extract(extract_path) as lines:
+        for pid, value, qid in iter_extract_ids(lines, extract_path):
+            kind = index_properties[pid]
+            key = normalise_key(kind, value)
+            if key is None:
+                continue
+            batch.append((kind, key, qid))
+            if len(batch) >= build_batch_size:
+                conn.executemany('INSERT INTO ids VALUES (?, ?, ?)', batch)
+                count += len(batch)
+                batch = []
+    if batch:
+        conn.executemany('INSERT INTO ids VALUES (?, ?, ?)', batch)
+        count += len(batch)
+    conn.commit()
+    conn.execute('CREATE INDEX ids_kind_key ON ids (kind, key)')
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    return count
+
+
+class WikidataIndex:
+    # Identifier -> QID lookups against an index built by build_index. Keys
+    # claimed by more than one item are treated as unresolved.
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No Wikidata index at {path}, run 'python src/wikidata_index.py build' first")
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def lookup_keys(self, kind, keys):
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        conn = self._connection()
+        for start in range(0, len(keys), lookup_batch_size):
+            chunk = keys[start:start + lookup_batch_size]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, MIN(qid) FROM ids WHERE kind = ? AND key IN ({placeholders}) "
+                "GROUP BY key HAVING COUNT(DISTINCT qid) = 1",
+                [kind] + chunk,
+            )
+            found.update(rows)
+        return found
+
+    def lookup(self, kind, values):
+        # Series of identifiers -> Series of QIDs (None where unresolved).
+        keys = values.map(lambda value: normalise_key(kind, value))
+        found = self.lookup_keys(kind, keys.dropna())
+        qids = keys.map(found)
+        return qids.astype(object).where(qids.notna(), None)
+
+    def resolve(self, df, keys, wd_id=None):
+        # First QID found over the (column, key kind) pairs, starting from the
+        # already known wd_id values.
+        if wd_id is None:
+            wd_id = pd.Series(None, index=df.index, dtype=object)
+        for column, kind in keys:
+            unresolved = wd_id.isna()
+            if not unresolved.any():
+                break
+            wd_id = wd_id.where(~unresolved, self.lookup(kind, df.loc[unresolved, column]))
+        return wd_id.astype(object).where(wd_id.notna(), None)
+
+
+def prefill_coauthors(coauthor_list, index):
+    # Adds wd_id from dblp's own Wikidata link or the index, and links
+    # entity_to_link to it, so OpenRefine only has to reconcile the rest.
+    known = coauthor_list['wikidata'].str.removeprefix(wikidata_entity_prefix)
+    wd_id = index.resolve(coauthor_list, coauthor_keys, known.where(known.notna(), None))
+    return coauthor_list.assign(
+        entity_to_link=wd_id.where(wd_id.notna(), coauthor_list['entity_to_link']),
+        wd_id=wd_id,
+    )
+
+def prefill_proceedings(proceedings_list, index):
+    wd_id = index.resolve(proceedings_list, proceedings_keys)
+    return proceedings_list.assign(
+        entity_to_link=wd_id.where(wd_id.notna(), proceedings_list['entity_to_link']),
+        wd_id=wd_id,
+    )
+
+def prefill_articles(article_list, index):
+    # Articles already on Wikidata (by dblp publication ID or DOI), starting
+    # from any wd_id an uploaded article map has given.
+    known = article_list['wd_id'] if 'wd_id' in article_list.columns else None
+    wd_id = index.resolve(article_list, article_keys, known)
+    return article_list.assign(
+        entity_to_link=wd_id.where(wd_id.notna(), article_list['entity_to_link']),
+        wd_id=wd_id,
+    )
+
+prefill_functions = {
+    'coauthor_list': prefill_coauthors,
+    'proceedings_list': prefill_proceedings,
+    'scholarly_article_list': prefill_articles,
+}
+
+def prefill_bundle(bundle, index=None):
+    index = get_wikidata_index() if index is None else index
+    if index is None:
+        return bundle
+    return {list_name: prefill_functions[list_name](df, index) if list_name in prefill_functions else df
+            for list_name, df in bundle.items()}
+
+
+_wikidata_index = None
+_wikidata_index_path = os.environ.get('DBLP_WIKIDATA_INDEX') or None
+_wikidata_index_lock = threading.Lock()
+
+def get_wikidata_index():
+    # Pre-reconciliation is used when DBLP_WIKIDATA_INDEX (or
+    # set_wikidata_index) points to a built index.
+    global _wikidata_index
+    with _wikidata_index_lock:
+        if _wikidata_index is None and _wikidata_index_path is not None:
+            _wikidata_index = WikidataIndex(_wikidata_index_path)
+        return _wikidata_index
+
+def set_wikidata_index(path):
+    global _wikidata_index, _wikidata_index_path
+    with _wikidata_index_lock:
+        _wikidata_index_path = path
+        _wikidata_index = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the local Wikidata index used to pre-reconcile coauthors, proceedings and articles.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="index a Wikidata JSON dump (.json, .json.gz, .json.bz2) or an item,property,value CSV/TSV extract")
+    build.add_argument("extract")
+    build.add_argument("index", help="SQLite file to create")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build_index(args.extract, args.index)
+        print(f"indexed {count} identifiers into {args.index}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())